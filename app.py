@@ -4,39 +4,99 @@ import json
 import os
 import time
 
-API_URL = "http://127.0.0.1:8000/review"
+API_BASE = "http://127.0.0.1:8000"
+JOBS_URL = f"{API_BASE}/jobs"
+POLL_SECONDS = 1.0
+# Progress events reported per file: parse, classify, retrieve, detect, annotate, done.
+STAGES_PER_FILE = 6
+
+MIME_TYPES = {
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".pdf": "application/pdf",
+}
 
 st.set_page_config(page_title="ADGM Corporate Agent", layout="wide")
 
 st.title("ADGM Corporate Agent: AI Compliance Review")
-st.caption("Upload one or more .docx documents for a compliance check against ADGM regulations.")
+st.caption("Upload one or more .docx or .pdf documents for a compliance check against ADGM regulations.")
 
 uploaded_files = st.file_uploader(
-    "Drag and drop your ADGM legal documents here (.docx only)",
-    type=["docx"],
+    "Drag and drop your ADGM legal documents here (.docx or .pdf)",
+    type=["docx", "pdf"],
     accept_multiple_files=True
 )
 
 if 'report_data' not in st.session_state:
     st.session_state.report_data = None
+if 'job_id' not in st.session_state:
+    # A browser reload starts a new session; the job id survives in the URL.
+    st.session_state.job_id = st.query_params.get("job")
+
+
+def set_job(job_id):
+    """Tracks job_id (or none) in the session and in the page URL."""
+    st.session_state.job_id = job_id
+    if job_id:
+        st.query_params["job"] = job_id
+    else:
+        st.query_params.pop("job", None)
+
 
 if uploaded_files:
     if st.button("Start Full Review", type="primary"):
-        with st.spinner("The AI agent is analyzing your documents... This may take a moment."):
-            files_for_api = [
-                ("files", (f.name, f.getvalue(), "application/vnd.openxmlformats-officedocument.wordprocessingml.document"))
-                for f in uploaded_files
-            ]
-
-            try:
-                resp = requests.post(API_URL, files=files_for_api, timeout=300)
-                st.session_state.report_data = resp.json()
-            except requests.exceptions.ConnectionError:
-                st.error("Connection Failed: Cannot connect to the backend API. Ensure the FastAPI server is running.", icon="🚨")
-                st.session_state.report_data = None
-            except Exception as e:
-                st.error(f"An unexpected error occurred: {e}", icon="🔥")
-                st.session_state.report_data = None
+        files_for_api = [
+            ("files", (f.name, f.getvalue(), MIME_TYPES.get(os.path.splitext(f.name)[1].lower(), "application/octet-stream")))
+            for f in uploaded_files
+        ]
+
+        try:
+            resp = requests.post(JOBS_URL, files=files_for_api, timeout=60)
+            resp.raise_for_status()
+            set_job(resp.json()["job_id"])
+            st.session_state.report_data = None
+        except requests.exceptions.ConnectionError:
+            st.error("Connection Failed: Cannot connect to the backend API. Ensure the FastAPI server is running.", icon="🚨")
+            set_job(None)
+        except Exception as e:
+            st.error(f"An unexpected error occurred: {e}", icon="🔥")
+            set_job(None)
+
+
+# The review runs as a background job on the API; poll it until it finishes.
+# The job id is also kept in the URL (?job=<id>), so a page reload resumes polling.
+if st.session_state.job_id:
+    job_id = st.session_state.job_id
+    status_text = st.empty()
+    progress_bar = st.progress(0.0)
+    while True:
+        try:
+            job = requests.get(f"{JOBS_URL}/{job_id}", timeout=10).json()
+        except requests.exceptions.RequestException as e:
+            status_text.warning(f"Waiting for the backend API... ({e})")
+            time.sleep(POLL_SECONDS)
+            continue
+
+        files = job.get("files") or []
+        progress_events = [e for e in job.get("events", []) if e.get("type") == "progress"]
+        total = max(1, len(files) * STAGES_PER_FILE)
+        progress_bar.progress(min(1.0, len(progress_events) / total))
+        if progress_events:
+            last = progress_events[-1]
+            status_text.info(f"Job {job.get('status')}: **{last['file']}** - {last['stage']}")
+        else:
+            status_text.info(f"Job {job.get('status')}...")
+
+        if job.get("status") == "completed":
+            st.session_state.report_data = job.get("result")
+            set_job(None)
+            status_text.empty()
+            progress_bar.empty()
+            break
+        if job.get("status") == "failed" or job.get("detail"):
+            st.error(f"The review failed: {job.get('error') or job.get('detail')}", icon="🔥")
+            set_job(None)
+            break
+        time.sleep(POLL_SECONDS)
 
 
 if st.session_state.report_data:
@@ -100,9 +160,9 @@ if st.session_state.report_data:
                 if os.path.exists(filepath):
                     with open(filepath, "rb") as f:
                         st.download_button(
-                            f"Download reviewed_{filename}",
+                            f"Download {os.path.basename(filepath)}",
                             data=f.read(),
-                            file_name=f"reviewed_{filename}",
+                            file_name=os.path.basename(filepath),
                             mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
                         )
 
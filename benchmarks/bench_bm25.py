@@ -0,0 +1,56 @@
+"""
+Build, load and query timings of the BM25 index on a synthetic reference
+corpus, for a short term query and for a whole-upload query as issued by
+hybrid retrieval.
+
+Usage: python benchmarks/bench_bm25.py [--chunks 5000] [--words 130] [--queries 500]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.bm25_index import BM25Index, build_bm25_index
+
+LEGAL_TERMS = ["ADGM", "Courts", "Registrar", "Article", "17.2", "shareholder", "director", "resolution",
+               "jurisdiction", "Companies", "Regulations", "2020", "signatory", "UBO", "memorandum"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=130)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocab = [f"term{i}" for i in range(20000)] + LEGAL_TERMS * 50
+    documents = [" ".join(rng.choice(vocab) for _ in range(args.words)) for _ in range(args.chunks)]
+    ids = [f"chunk_{i}" for i in range(args.chunks)]
+    metadatas = [{"source": f"source_{i % 40}.pdf", "doc_type": "General"} for i in range(args.chunks)]
+    upload = " ".join(rng.choice(vocab) for _ in range(3000))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        build_bm25_index(ids, documents, metadatas, tmp)
+        build_s = time.perf_counter() - started
+        started = time.perf_counter()
+        index = BM25Index(tmp)
+        load_s = time.perf_counter() - started
+
+        for name, query in (("term query", "ADGM Courts Registrar Article 17.2"), ("whole upload", upload)):
+            started = time.perf_counter()
+            for _ in range(args.queries):
+                index.query(query, 12)
+            per_query = (time.perf_counter() - started) / args.queries
+            print(f"{name:<13} {per_query * 1000:.3f} ms/query")
+
+    print(f"build {build_s:.2f}s, load {load_s * 1000:.1f} ms ({args.chunks} chunks)")
+
+
+if __name__ == "__main__":
+    main()
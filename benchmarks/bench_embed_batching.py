@@ -0,0 +1,130 @@
+"""
+Throughput and latency of single-text embedding requests issued by 16 to 64
+concurrent callers. Each request is encoded on its own (direct) or through
+the micro-batching EmbeddingBatcher.
+
+The encoder is all-MiniLM-L6-v2 when sentence-transformers is installed
+(--encoder minilm). Otherwise it is a NumPy stand-in (--encoder dense)
+shaped like a small transformer: token embeddings padded to the longest
+text, six 384-1536-384 residual MLP blocks, then mean pooling. Like MiniLM,
+it pays a fixed cost on every call and runs faster per row on larger
+matrices.
+
+Usage: python benchmarks/bench_embed_batching.py [--concurrency 16,32,64] [--requests 10]
+                                                 [--encoder auto|minilm|dense|hash]
+                                                 [--max-batch 64] [--max-wait-ms 5]
+"""
+import argparse
+import re
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.embed_batcher import EmbeddingBatcher
+
+SENTENCE = ("The Company shall notify the Registrar of any change to its registered office within "
+            "fourteen days, in accordance with the ADGM Companies Regulations 2020, clause {n}.")
+
+
+class DenseStandIn:
+    """Token embeddings padded to the longest text, six residual MLP blocks with layer norm, mean pooling."""
+
+    def __init__(self, vocab: int = 30000, dim: int = 384, hidden: int = 1536, layers: int = 6):
+        rng = np.random.default_rng(0)
+        self.vocab = vocab
+        self.embeddings = rng.normal(size=(vocab, dim)).astype(np.float32)
+        self.layers = [
+            ((rng.normal(size=(dim, hidden)) / np.sqrt(dim)).astype(np.float32),
+             (rng.normal(size=(hidden, dim)) / np.sqrt(hidden)).astype(np.float32))
+            for _ in range(layers)
+        ]
+
+    def encode(self, texts, show_progress_bar=False):
+        ids = [[zlib.crc32(w.encode()) % self.vocab for w in re.findall(r"\w+", t.lower())] or [0] for t in texts]
+        length = max(len(row) for row in ids)
+        padded = np.array([row + [0] * (length - len(row)) for row in ids])
+        x = self.embeddings[padded].reshape(len(texts) * length, -1)
+        for w1, w2 in self.layers:
+            x = x + np.maximum(x @ w1, 0) @ w2
+            x = (x - x.mean(axis=1, keepdims=True)) / (x.std(axis=1, keepdims=True) + 1e-5)
+        out = x.reshape(len(texts), length, -1).mean(axis=1)
+        return out / (np.linalg.norm(out, axis=1, keepdims=True) + 1e-12)
+
+
+def load_encoder(name: str):
+    if name in ("auto", "minilm"):
+        try:
+            from sentence_transformers import SentenceTransformer
+            return "minilm", SentenceTransformer("all-MiniLM-L6-v2")
+        except ImportError:
+            if name == "minilm":
+                raise
+    if name == "hash":
+        from src.stub_backends import HashEmbedder
+        return "hash", HashEmbedder()
+    return "dense", DenseStandIn()
+
+
+def run(encode, concurrency: int, requests: int):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency)
+
+    def caller(worker):
+        barrier.wait()
+        for i in range(requests):
+            started = time.perf_counter()
+            encode([SENTENCE.format(n=worker * requests + i)])
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=caller, args=(w,)) for w in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": len(latencies) / total,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="16,32,64")
+    parser.add_argument("--requests", type=int, default=10, help="requests per concurrent caller")
+    parser.add_argument("--encoder", default="auto")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    name, model = load_encoder(args.encoder)
+
+    def direct(texts):
+        return model.encode(texts, show_progress_bar=False)
+
+    direct(["warm up"])
+    print(f"encoder: {name}, max batch {args.max_batch}, max wait {args.max_wait_ms} ms")
+    print(f"{'callers':>7} {'mode':<8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'avg batch':>9}")
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        r = run(direct, concurrency, args.requests)
+        print(f"{concurrency:>7} {'direct':<8} {r['rps']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {1:>9.1f}")
+        batcher = EmbeddingBatcher(direct, args.max_batch, args.max_wait_ms / 1000)
+        r = run(batcher.encode, concurrency, args.requests)
+        print(f"{concurrency:>7} {'batched':<8} {r['rps']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+              f"{batcher.stats()['avg_batch_size']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
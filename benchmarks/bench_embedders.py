@@ -0,0 +1,177 @@
+"""
+Compares the embedding backends (src/embedding_backends.py) on startup,
+throughput and retrieval quality over the ADGM reference set.
+
+  startup     seconds and peak RSS of a fresh process that imports the
+              backend, loads it and encodes one text
+  throughput  reference chunks encoded per second in ingestion-sized
+              batches, and the median latency of one query
+  quality     each reference chunk is cut in two. The first halves are
+              indexed, and the first --query-words words of each second half
+              are used as a query. A hit is the query's own chunk. The
+              benchmark reports recall@1, recall@5 and MRR, plus how often
+              the top hit comes from the query's source document.
+
+The reference set is read from the exported vector index (written by
+ingestion), or from the downloaded sources in --corpus. Without either, the
+ADGM sample documents in Input_output_docs are split into short passages.
+That is only a smoke test. all-MiniLM-L6-v2 is skipped when
+sentence-transformers is not installed. ngram+idf fits the IDF table on the
+indexed halves, as `python -m src.embedding_backends` does on the chunks.
+
+Usage: python benchmarks/bench_embedders.py [--backends minilm,ngram,ngram+idf,hash]
+                                            [--corpus data_sources] [--query-words 60]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.vector_index import VECTOR_INDEX_DIR
+
+SAMPLE_DIR = ROOT / "Input_output_docs"
+SAMPLE_PASSAGE_WORDS = 100
+ENCODE_BATCH = 64
+MIN_CHUNK_WORDS = 40
+
+# EMBED_BACKEND value of each benchmarked backend.
+BACKENDS = {"minilm": "sentence-transformers", "ngram": "ngram", "ngram+idf": "ngram", "hash": "hash"}
+
+STARTUP_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+from src.embedding_backends import make_embed_backend
+model = make_embed_backend(sys.argv[1])
+model.encode(["The Company shall notify the Registrar."])
+print(json.dumps({"seconds": time.perf_counter() - started,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def load_reference_chunks(corpus: Path) -> tuple:
+    """(label, [(source, chunk text)]) of the reference set."""
+    meta_path = VECTOR_INDEX_DIR / "meta.json"
+    if meta_path.exists():
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        sources = [(m or {}).get("source", "") for m in meta["metadatas"]]
+        return f"vector index ({meta_path})", list(zip(sources, meta["documents"]))
+
+    from src.data_ingest import chunk_text, extract_text
+
+    files = sorted(p for p in corpus.glob("*") if p.suffix.lower() in (".pdf", ".docx"))
+    if files:
+        chunks = [(p.name, c) for p in files for c in chunk_text(extract_text(p))]
+        return f"{len(files)} sources in {corpus}", chunks
+
+    chunks = []
+    for p in sorted(SAMPLE_DIR.glob("*.docx")):
+        words = extract_text(p).split()
+        for i in range(0, len(words), SAMPLE_PASSAGE_WORDS):
+            chunks.append((p.name, " ".join(words[i:i + SAMPLE_PASSAGE_WORDS])))
+    return f"sample documents in {SAMPLE_DIR.name} (smoke test only)", chunks
+
+
+def make_tasks(chunks: list, query_words: int) -> tuple:
+    """Indexed first halves, their sources, and one query per chunk from its second half."""
+    documents, sources, queries = [], [], []
+    for source, text in chunks:
+        words = text.split()
+        if len(words) < MIN_CHUNK_WORDS:
+            continue
+        half = len(words) // 2
+        documents.append(" ".join(words[:half]))
+        sources.append(source)
+        queries.append(" ".join(words[half:half + query_words]))
+    return documents, sources, queries
+
+
+def startup(backend: str, env: dict) -> dict:
+    out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, backend], cwd=str(ROOT),
+                         env=dict(os.environ, **env), capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def encode_all(model, texts: list) -> np.ndarray:
+    rows = [model.encode(texts[i:i + ENCODE_BATCH], show_progress_bar=False) for i in range(0, len(texts), ENCODE_BATCH)]
+    matrix = np.vstack(rows).astype(np.float32)
+    return matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+
+
+def evaluate(model, documents: list, sources: list, queries: list) -> dict:
+    started = time.perf_counter()
+    doc_matrix = encode_all(model, documents)
+    throughput = len(documents) / (time.perf_counter() - started)
+
+    latencies = []
+    for q in queries[:50]:
+        t = time.perf_counter()
+        model.encode([q], show_progress_bar=False)
+        latencies.append(time.perf_counter() - t)
+
+    scores = encode_all(model, queries) @ doc_matrix.T
+    # Rank of each query's own chunk (0 = top hit).
+    ranks = (scores > scores[np.arange(len(queries)), np.arange(len(queries))][:, None]).sum(axis=1)
+    top = scores.argmax(axis=1)
+    return {
+        "throughput": throughput,
+        "query_ms": float(np.median(latencies)) * 1000,
+        "recall@1": float(np.mean(ranks < 1)),
+        "recall@5": float(np.mean(ranks < 5)),
+        "mrr": float(np.mean(1.0 / (ranks + 1))),
+        "source@1": float(np.mean([sources[t] == s for t, s in zip(top, sources)])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default="minilm,ngram,ngram+idf,hash")
+    parser.add_argument("--corpus", default="data_sources", help="directory of downloaded reference PDFs/DOCX")
+    parser.add_argument("--query-words", type=int, default=60)
+    args = parser.parse_args()
+
+    from src.embedding_backends import NgramEmbedder, make_embed_backend
+
+    label, chunks = load_reference_chunks(ROOT / args.corpus)
+    documents, sources, queries = make_tasks(chunks, args.query_words)
+    print(f"reference set: {label}; {len(documents)} chunks, {len(set(sources))} sources")
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_embedders_"))
+    idf_path = tmp / "ngram_idf.npy"
+    try:
+        np.save(idf_path, NgramEmbedder(idf_path=tmp / "none.npy").fit_idf(documents))
+        print(f"{'backend':<10} {'startup s':>9} {'RSS MB':>7} {'chunks/s':>9} {'query ms':>8} "
+              f"{'R@1':>6} {'R@5':>6} {'MRR':>6} {'src@1':>6}")
+        for name in args.backends.split(","):
+            # Without a table at its path, the n-gram embedder runs on term frequencies alone.
+            ngram_idf = idf_path if name == "ngram+idf" else tmp / "none.npy"
+            try:
+                s = startup(BACKENDS[name], {"EMBED_NGRAM_IDF_PATH": str(ngram_idf)})
+            except RuntimeError as e:
+                print(f"{name:<10} skipped: {e}")
+                continue
+            if BACKENDS[name] == "ngram":
+                model = NgramEmbedder(idf_path=ngram_idf)
+            else:
+                model = make_embed_backend(BACKENDS[name])
+            r = evaluate(model, documents, sources, queries)
+            print(f"{name:<10} {s['seconds']:>9.2f} {s['rss_mb']:>7.0f} {r['throughput']:>9.1f} {r['query_ms']:>8.2f} "
+                  f"{r['recall@1']:>6.3f} {r['recall@5']:>6.3f} {r['mrr']:>6.3f} {r['source@1']:>6.3f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Measures the cold-start cost of `import src.utils`.
+
+Each scenario runs in a fresh interpreter and reports wall time and peak RSS:
+  - lazy:   import only (what the API process and CLI tools now pay at startup)
+  - warmed: import followed by warmup(), i.e. the cost every import used to pay
+            when the model, Chroma client and Gemini SDK were created eagerly.
+
+Usage: python benchmarks/bench_import.py [--runs N]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SNIPPET = """
+import json, resource, time
+t0 = time.perf_counter()
+import src.utils as utils
+t1 = time.perf_counter()
+if {warm}:
+    utils.warmup()
+t2 = time.perf_counter()
+print(json.dumps({{
+    "import_s": t1 - t0,
+    "total_s": t2 - t0,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def run(warm: bool, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(warm=warm)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "total_s_median": round(statistics.median(s["total_s"] for s in samples), 3),
+        "peak_rss_mb_median": round(statistics.median(s["peak_rss_mb"] for s in samples), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    lazy = run(False, args.runs)
+    warmed = run(True, args.runs)
+    print(f"{'scenario':<10}{'startup (s)':>14}{'peak RSS (MB)':>16}")
+    print(f"{'lazy':<10}{lazy['total_s_median']:>14}{lazy['peak_rss_mb_median']:>16}")
+    print(f"{'warmed':<10}{warmed['total_s_median']:>14}{warmed['peak_rss_mb_median']:>16}")
+    if lazy["total_s_median"]:
+        print(f"startup speed-up: {warmed['total_s_median'] / lazy['total_s_median']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmarks the ingest download stage against a local HTTP stand-in.
+
+A ThreadingHTTPServer serves synthetic files with an artificial per-request
+delay (to mimic a remote host), and the script compares one-at-a-time
+downloads with data_ingest.download_all() on a pooled session.
+
+Usage: python benchmarks/bench_ingest_download.py [--files N] [--delay-ms MS] [--size-kb KB]
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import data_ingest
+
+
+class _SlowHandler(SimpleHTTPRequestHandler):
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(directory: Path, delay: float):
+    handler = type("Handler", (_SlowHandler,), {"delay": delay})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=str(directory)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--delay-ms", type=float, default=100)
+    parser.add_argument("--size-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as src_dir, tempfile.TemporaryDirectory() as out_dir:
+        src_dir, out_dir = Path(src_dir), Path(out_dir)
+        for i in range(args.files):
+            (src_dir / f"doc_{i}.pdf").write_bytes(b"x" * args.size_kb * 1024)
+        server = serve(src_dir, args.delay_ms / 1000)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        urls = [f"{base}/doc_{i}.pdf" for i in range(args.files)]
+
+        serial_dir = out_dir / "serial"
+        serial_dir.mkdir()
+        started = time.perf_counter()
+        for url in urls:
+            data_ingest.download_file(url, download_dir=serial_dir)
+        serial = time.perf_counter() - started
+
+        pooled_dir = out_dir / "pooled"
+        pooled_dir.mkdir()
+        started = time.perf_counter()
+        results = list(data_ingest.download_all(urls, download_dir=pooled_dir))
+        pooled = time.perf_counter() - started
+        server.shutdown()
+
+    ok = sum(1 for _, path in results if path)
+    print(f"files: {args.files}, delay: {args.delay_ms} ms, size: {args.size_kb} KB")
+    print(f"serial downloads:  {serial:.2f}s")
+    print(f"pooled downloads:  {pooled:.2f}s ({data_ingest.DOWNLOAD_WORKERS} workers, {ok}/{args.files} ok)")
+    print(f"speed-up: {serial / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
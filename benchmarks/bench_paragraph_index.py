@@ -0,0 +1,133 @@
+"""
+Compares issue-to-paragraph matching with and without the precomputed
+ParagraphIndex on a synthetic several-hundred-page document.
+
+The "legacy" matcher below is the per-issue paragraph scan that
+add_comments_to_docx used before the index was introduced; both matchers
+must agree on every issue.
+
+Usage: python benchmarks/bench_paragraph_index.py [--pages N] [--issues N]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import docx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.paragraph_index import ParagraphIndex, normalize_whitespace
+
+PARAGRAPHS_PER_PAGE = 12
+WORDS_PER_PARAGRAPH = 45
+
+
+def legacy_find(paragraphs, problematic_text, section_text):
+    if problematic_text and not problematic_text.strip():
+        problematic_text = None
+    if problematic_text:
+        lower_target = problematic_text.lower()
+        for i, p in enumerate(paragraphs):
+            if problematic_text in p.text:
+                return i
+        for i, p in enumerate(paragraphs):
+            if lower_target in p.text.lower():
+                return i
+        norm_target = normalize_whitespace(problematic_text).lower()
+        for i, p in enumerate(paragraphs):
+            if normalize_whitespace(p.text).lower().find(norm_target) != -1:
+                return i
+        token_set = set(re.findall(r"\w+", problematic_text.lower()))
+        if token_set:
+            for i, p in enumerate(paragraphs):
+                p_tokens = set(re.findall(r"\w+", p.text.lower()))
+                if p_tokens and len(token_set & p_tokens) / len(token_set) >= 0.6:
+                    return i
+    if section_text:
+        st = section_text.strip()
+        for i, p in enumerate(paragraphs):
+            if st in p.text:
+                return i
+        for i, p in enumerate(paragraphs):
+            if st.lower() in p.text.lower():
+                return i
+        st_norm = normalize_whitespace(st).lower()
+        for i, p in enumerate(paragraphs):
+            if normalize_whitespace(p.text).lower().find(st_norm) != -1:
+                return i
+    return None
+
+
+def find_all(index: ParagraphIndex, issues: list) -> list:
+    """Paragraph index the index locates for each issue, or None."""
+    hits = [index.locate(i["problematic_text"], i["section"]) for i in issues]
+    return [hit[0] if hit is not None else None for hit in hits]
+
+
+def build_document(pages: int, rng: random.Random):
+    vocab = [w for w in (
+        "company shareholder director board resolution registrar adgm courts article clause "
+        "shall may notice meeting quorum share capital transfer liability member register "
+        "office jurisdiction law dispute appointment removal vote ordinary special written "
+        "signature dated hereby accordance regulations provided however subject thereof"
+    ).split()]
+    doc = docx.Document()
+    for n in range(pages * PARAGRAPHS_PER_PAGE):
+        if n % PARAGRAPHS_PER_PAGE == 0:
+            doc.add_paragraph(f"Article {n // PARAGRAPHS_PER_PAGE + 1} Section Heading")
+        doc.add_paragraph(" ".join(rng.choice(vocab) for _ in range(WORDS_PER_PARAGRAPH)) + f" ref{n}.")
+    return doc
+
+
+def build_issues(paragraphs, count: int, rng: random.Random):
+    issues = []
+    for n in range(count):
+        words = rng.choice([p for p in paragraphs[len(paragraphs) // 2:] if not p.text.startswith("Article")]).text.split()
+        start = rng.randrange(0, len(words) - 10)
+        snippet = " ".join(words[start:start + 10])
+        kind = n % 5
+        if kind == 1:
+            snippet = snippet.upper()
+        elif kind == 2:
+            snippet = snippet.replace(" ", "   ")
+        elif kind == 3:
+            snippet = " ".join(reversed(snippet.split()))
+        elif kind == 4:
+            snippet = "text the model paraphrased beyond recognition"
+        issues.append({"problematic_text": snippet, "section": f"Article {rng.randint(1, 400)} Section Heading"})
+    return issues
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--issues", type=int, default=60)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    doc = build_document(args.pages, rng)
+    paragraphs = doc.paragraphs
+    issues = build_issues(paragraphs, args.issues, rng)
+    print(f"{len(paragraphs)} paragraphs, {len(issues)} issues")
+
+    started = time.perf_counter()
+    legacy = [legacy_find(paragraphs, i["problematic_text"], i["section"]) for i in issues]
+    legacy_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = ParagraphIndex([p.text for p in paragraphs])
+    built_s = time.perf_counter() - started
+    indexed = find_all(index, issues)
+    indexed_s = time.perf_counter() - started
+
+    assert legacy == indexed, "index and legacy matcher disagree"
+    print(f"legacy scan:      {legacy_s:.3f}s")
+    print(f"paragraph index:  {indexed_s:.3f}s (build {built_s:.3f}s)")
+    print(f"speed-up: {legacy_s / indexed_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compares PDF text extraction strategies on a large PDF:
+  - legacy:   serial `text += page.extract_text()` loop (previous parse_document)
+  - streamed: pdf_extract.extract_pdf_pages with one worker (page generator)
+  - parallel: pdf_extract.extract_pdf_pages with page ranges on a process pool
+
+Pass a real filing with --pdf, or let the script generate a synthetic
+text-only PDF of --pages pages.
+
+Usage: python benchmarks/bench_pdf_extract.py [--pdf PATH | --pages 300] [--workers N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pdfplumber
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.pdf_extract import extract_pdf_pages
+
+LINES_PER_PAGE = 45
+
+
+def write_synthetic_pdf(path: Path, pages: int):
+    """Writes a minimal multi-page PDF with Helvetica text lines, no dependencies needed."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        lines = [f"Article {p + 1}.{n} The Company shall comply with the ADGM Companies Regulations 2020 and notify the Registrar."
+                 for n in range(LINES_PER_PAGE)]
+        stream = "BT /F1 9 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+
+
+def legacy(path: Path) -> str:
+    text = ""
+    with pdfplumber.open(str(path)) as pdf:
+        for page in pdf.pages:
+            text += page.extract_text() or ""
+    return text
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", type=Path)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf
+        if path is None:
+            path = Path(tmp) / "synthetic.pdf"
+            write_synthetic_pdf(path, args.pages)
+
+        legacy_text, legacy_s = timed(lambda: legacy(path))
+        streamed, streamed_s = timed(lambda: list(extract_pdf_pages(path, workers=1)))
+        # The first parallel run includes process-pool start-up; report a warm run too.
+        parallel, cold_s = timed(lambda: list(extract_pdf_pages(path, workers=args.workers)))
+        parallel, warm_s = timed(lambda: list(extract_pdf_pages(path, workers=args.workers)))
+
+    assert streamed == parallel, "parallel extraction changed page text"
+    assert "".join(streamed) == legacy_text, "page text differs from the legacy extractor"
+    print(f"{path.name}: {len(streamed)} pages")
+    print(f"legacy serial concat: {legacy_s:.2f}s")
+    print(f"streamed (1 worker):  {streamed_s:.2f}s")
+    print(f"parallel ({args.workers} workers): {cold_s:.2f}s cold, {warm_s:.2f}s warm")
+    print(f"speed-up vs legacy: {legacy_s / warm_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
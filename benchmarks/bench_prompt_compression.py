@@ -0,0 +1,66 @@
+"""
+Token counts of uploaded text before and after prompt compression, and the
+cost of compressing. The document is Input.docx spread over the pages of
+a paginated contract (pages separated by form feeds, as in extracted PDF
+text), with a running header and page number on every page, blank-line
+padding, tab-padded table rows and a signature block per party.
+
+Usage: python benchmarks/bench_prompt_compression.py [--pages 5] [--parties 4] [--runs 20]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.document_model import load_document
+from src.prompt_compressor import compress_text
+from src.red_flag_detector import RED_FLAG_WINDOW_CHARS
+
+INPUT_DOCX = Path(__file__).resolve().parent.parent / "Input_output_docs" / "Input.docx"
+
+
+def noisy_document(body: str, pages: int, parties: int) -> str:
+    lines = body.splitlines()
+    per_page = -(-len(lines) // pages)
+    out = []
+    for page in range(pages):
+        out += ["\fACME Holdings Ltd - Private & Confidential" if page else "ACME Holdings Ltd - Private & Confidential",
+                "", ""]
+        out += lines[page * per_page:(page + 1) * per_page]
+        out += ["Item\t\t\tAmount\t\t\tDate", "Share capital\t\t\tAED 50,000\t\t\t__________"]
+        out += ["", "", "", f"Page {page + 1} of {pages}", ""]
+    for party in range(parties):
+        out += ["", "Signed for and on behalf of", "Name: ____________________", "Title: ____________________",
+                "Signature: ____________________", "Date: ......................", ""]
+    return "\n".join(out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--parties", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    body = load_document(INPUT_DOCX.name, INPUT_DOCX.read_bytes()).text
+    text = noisy_document(body, args.pages, args.parties)
+
+    started = time.perf_counter()
+    for _ in range(args.runs):
+        compressed = compress_text(text)
+    elapsed = (time.perf_counter() - started) / args.runs
+
+    stats = compressed.stats()
+    windows_before = -(-stats["raw_chars"] // RED_FLAG_WINDOW_CHARS)
+    windows_after = -(-stats["compressed_chars"] // RED_FLAG_WINDOW_CHARS)
+    print(f"raw        {stats['raw_chars']:>7} chars {stats['raw_tokens']:>6} tokens  {windows_before} prompt window(s)")
+    print(f"compressed {stats['compressed_chars']:>7} chars {stats['compressed_tokens']:>6} tokens  "
+          f"{windows_after} prompt window(s)")
+    print(f"reduction {stats['reduction'] * 100:.1f}%, {stats['lines_dropped']} lines dropped, "
+          f"compress {elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Compares top-k retrieval latency and recall of the in-process NumPy vector
+index against a Chroma collection holding the same synthetic corpus.
+
+Recall@k is measured against exact cosine search. Chroma's HNSW index is
+approximate; the NumPy index is exact by construction. When chromadb is not
+installed, only the NumPy index is measured.
+
+Usage: python benchmarks/bench_vector_index.py [--chunks 5000] [--queries 200] [--top-k 3]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.vector_index import VectorIndex, write_vector_index
+
+DIM = 384
+DOC_TYPES = ("Shareholder Resolution", "Articles of Association", "Employment Contract", "General")
+
+
+def make_corpus(chunks: int, rng):
+    centres = rng.normal(size=(64, DIM)).astype(np.float32)
+    vectors = centres[rng.integers(0, len(centres), chunks)] + 0.6 * rng.normal(size=(chunks, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk_{i}" for i in range(chunks)]
+    metadatas = [{"source": f"source_{i % 50}.docx", "chunk": i, "doc_type": DOC_TYPES[i % len(DOC_TYPES)]}
+                 for i in range(chunks)]
+    documents = [f"chunk text {i}" for i in range(chunks)]
+    return ids, vectors, documents, metadatas
+
+
+def exact_top_k(vectors, queries, k, mask=None):
+    scores = queries @ vectors.T
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+
+def measure(query_fn, queries, k, ids, truth):
+    latencies = []
+    hits = 0
+    for q, expected in zip(queries, truth):
+        started = time.perf_counter()
+        res = query_fn(q)
+        latencies.append(time.perf_counter() - started)
+        found = {int(i.split("_")[1]) for i in res["ids"][0]}
+        hits += len(found & expected)
+    latencies.sort()
+    return {
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "recall": hits / (k * len(queries)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    ids, vectors, documents, metadatas = make_corpus(args.chunks, rng)
+    picks = rng.integers(0, args.chunks, args.queries)
+    queries = vectors[picks] + 0.3 * rng.normal(size=(args.queries, DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    doc_type = DOC_TYPES[0]
+    mask = np.array([m["doc_type"] == doc_type for m in metadatas])
+    truth = exact_top_k(vectors, queries, args.top_k)
+    truth_typed = exact_top_k(vectors, queries, args.top_k, mask)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        write_vector_index(ids, vectors, documents, metadatas, "synthetic", Path(tmp) / "index")
+        started = time.perf_counter()
+        index = VectorIndex(Path(tmp) / "index")
+        load_s = time.perf_counter() - started
+        results["numpy"] = measure(lambda q: index.query([q.tolist()], args.top_k), queries, args.top_k, ids, truth)
+        results["numpy (doc_type)"] = measure(
+            lambda q: index.query([q.tolist()], args.top_k, where={"doc_type": doc_type}),
+            queries, args.top_k, ids, truth_typed)
+        print(f"numpy index load: {load_s * 1000:.1f} ms for {args.chunks} chunks")
+
+        try:
+            import chromadb
+        except ImportError:
+            print("chromadb is not installed; skipping the Chroma comparison.")
+        else:
+            client = chromadb.PersistentClient(path=str(Path(tmp) / "chroma"))
+            col = client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+            for start in range(0, args.chunks, 1000):
+                end = start + 1000
+                col.add(ids=ids[start:end], embeddings=vectors[start:end].tolist(),
+                        documents=documents[start:end], metadatas=metadatas[start:end])
+            results["chroma"] = measure(
+                lambda q: client.get_collection("bench").query(query_embeddings=[q.tolist()], n_results=args.top_k),
+                queries, args.top_k, ids, truth)
+            results["chroma (doc_type)"] = measure(
+                lambda q: client.get_collection("bench").query(query_embeddings=[q.tolist()], n_results=args.top_k,
+                                                               where={"doc_type": doc_type}),
+                queries, args.top_k, ids, truth_typed)
+
+    print(f"{'backend':<20} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(args.top_k):>10}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['recall']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Memory per worker and throughput of multi-process serving as the number of
+workers grows, comparing:
+
+  uvicorn   uvicorn main:app --workers N (every worker imports and loads
+            the model and indexes itself)
+  gunicorn  gunicorn -c gunicorn.conf.py with PRELOAD_MODELS=0
+  preload   gunicorn -c gunicorn.conf.py (model and indexes loaded once in
+            the master and shared copy-on-write)
+
+Each server reviews copies of the sample input through POST /review, using a
+synthetic NumPy vector index of --index-chunks reference chunks
+(RETRIEVAL_BACKEND=numpy). Memory is read from /proc/<pid>/smaps_rollup once
+every worker has served requests. RSS counts shared pages in full, USS only
+counts the pages private to a worker, and PSS splits shared pages between
+the processes that map them. The sum of PSS is the server's real footprint.
+
+Linux only. By default the offline stand-ins are used (fake LLM, hash
+embedder); pass --real-backends to load all-MiniLM-L6-v2, which is where
+preloading saves the most.
+
+Usage: python benchmarks/bench_workers.py [--workers 1,2,4] [--modes uvicorn,gunicorn,preload]
+                                          [--requests-per-worker 8] [--index-chunks 5000]
+                                          [--llm-latency 0.2] [--real-backends]
+"""
+import argparse
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from load_test import build_variants
+
+STARTUP_TIMEOUT_SECONDS = 120
+WORDS = ["company", "director", "shareholder", "resolution", "registrar", "ADGM", "courts", "article",
+         "jurisdiction", "articles", "association", "employment", "notice", "capital", "regulations"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def build_index(root: Path, chunks: int, embed_model: str, dim: int):
+    from src.vector_index import write_vector_index
+
+    rng = random.Random(0)
+    vectors = np.random.default_rng(0).normal(size=(chunks, dim)).astype(np.float32)
+    documents = [" ".join(rng.choice(WORDS) for _ in range(800)) for _ in range(chunks)]
+    metadatas = [{"source": f"source_{i % 40}.pdf", "chunk": i // 40, "doc_type": "General"} for i in range(chunks)]
+    write_vector_index([f"chunk_{i}" for i in range(chunks)], vectors, documents, metadatas, embed_model, root)
+
+
+def children(pid: int) -> list:
+    """Direct child processes of pid."""
+    out = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # The command name may contain spaces; ppid is the second field after it.
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            out.append(int(entry.name))
+    return out
+
+
+def memory_mb(pid: int) -> dict:
+    fields = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        name, value = line.split(":", 1)
+        fields[name] = int(value.split()[0]) / 1024
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "uss": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def start_server(mode: str, workers: int, port: int, env: dict):
+    if mode == "uvicorn":
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py", "--log-level", "warning"]
+        env = dict(env, BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers),
+                   PRELOAD_MODELS="1" if mode == "preload" else "0")
+    return subprocess.Popen(cmd, cwd=str(ROOT), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(client, proc):
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with status {proc.returncode}")
+        try:
+            if client.get("/healthz").status_code == 200:
+                return
+        except Exception:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start in time")
+
+
+def measure(mode: str, workers: int, requests: int, env: dict) -> dict:
+    import httpx
+
+    port = free_port()
+    proc = start_server(mode, workers, port, env)
+    client = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=None)
+    try:
+        wait_ready(client, proc)
+        variants = build_variants(requests, 1)
+
+        def one(item):
+            resp = client.post("/review", files={"files": item})
+            resp.raise_for_status()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=2 * workers) as pool:
+            list(pool.map(one, variants))
+        elapsed = time.perf_counter() - started
+
+        # The master's children, apart from multiprocessing's resource tracker, are the workers.
+        worker_pids = [pid for pid in children(proc.pid)
+                       if b"resource_tracker" not in Path(f"/proc/{pid}/cmdline").read_bytes()]
+        if worker_pids:
+            master = memory_mb(proc.pid)
+            per_worker = [memory_mb(pid) for pid in worker_pids]
+        else:
+            # uvicorn serves a single worker in the master process itself.
+            master = {"pss": 0.0}
+            per_worker = [memory_mb(proc.pid)]
+        return {
+            "mode": mode,
+            "workers": len(per_worker),
+            "throughput": requests / elapsed,
+            "worker_rss": sum(m["rss"] for m in per_worker) / max(1, len(per_worker)),
+            "worker_uss": sum(m["uss"] for m in per_worker) / max(1, len(per_worker)),
+            "total_pss": master["pss"] + sum(m["pss"] for m in per_worker),
+        }
+    finally:
+        client.close()
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--modes", default="uvicorn,gunicorn,preload")
+    parser.add_argument("--requests-per-worker", type=int, default=8)
+    parser.add_argument("--index-chunks", type=int, default=5000)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub LLM seconds per call")
+    parser.add_argument("--real-backends", action="store_true", help="use the real embedding model (LLM stays fake)")
+    args = parser.parse_args()
+
+    embed_model, dim = ("all-MiniLM-L6-v2", 384) if args.real_backends else ("hash-embedder-384", 384)
+    tmp = Path(tempfile.mkdtemp(prefix="bench_workers_"))
+    try:
+        build_index(tmp / "vector_index", args.index_chunks, embed_model, dim)
+        env = dict(
+            os.environ,
+            LLM_BACKEND="fake",
+            EMBED_BACKEND="sentence-transformers" if args.real_backends else "hash",
+            STUB_LLM_LATENCY_SECONDS=str(args.llm_latency),
+            LLM_REQUESTS_PER_MINUTE="0",
+            LLM_TOKENS_PER_MINUTE="0",
+            LLM_CACHE_DISABLED="1",
+            EMBED_CACHE_DISABLED="1",
+            RETRIEVAL_BACKEND="numpy",
+            VECTOR_INDEX_DIR=str(tmp / "vector_index"),
+        )
+
+        print(f"{'mode':<9} {'workers':>7} {'req/s':>7} {'RSS/worker':>11} {'USS/worker':>11} {'total PSS':>10}  (MB)")
+        for workers in [int(w) for w in args.workers.split(",")]:
+            for mode in args.modes.split(","):
+                r = measure(mode, workers, workers * args.requests_per_worker, env)
+                print(f"{r['mode']:<9} {r['workers']:>7} {r['throughput']:>7.2f} {r['worker_rss']:>11.1f} "
+                      f"{r['worker_uss']:>11.1f} {r['total_pss']:>10.1f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+End-to-end load test of the review pipeline.
+
+Builds --requests variants of Input_output_docs/Input.docx (each tagged with
+a unique paragraph, optionally with the body repeated --repeat times to make
+longer documents) and reviews them with --concurrency requests in flight.
+
+By default the pipeline runs in-process against the offline stand-ins
+(LLM_BACKEND=fake, EMBED_BACKEND=hash, caches disabled, no LLM rate limit),
+and the report gives p50/p95/p99 latency, throughput and peak RSS for every
+pipeline stage. With --url the same uploads are POSTed to a running server's
+/review endpoint instead and only end-to-end latency and throughput are
+reported.
+
+Usage:
+  python benchmarks/load_test.py [--requests 32] [--concurrency 8] [--repeat 1]
+                                 [--llm-latency 0.5] [--real-backends] [--use-cache]
+  python benchmarks/load_test.py --url http://127.0.0.1:8000
+"""
+import argparse
+import io
+import os
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import docx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+INPUT_DOCX = ROOT / "Input_output_docs" / "Input.docx"
+RSS_SAMPLE_SECONDS = 0.02
+
+
+def build_variants(count: int, repeat: int) -> list:
+    """Returns [(filename, docx bytes)] of distinct copies of the sample input."""
+    variants = []
+    for i in range(count):
+        document = docx.Document(str(INPUT_DOCX))
+        body = [p.text for p in document.paragraphs]
+        for _ in range(repeat - 1):
+            for text in body:
+                document.add_paragraph(text)
+        document.add_paragraph(f"Load test variant {i}: reference LT-{i:05d}.")
+        buf = io.BytesIO()
+        document.save(buf)
+        variants.append((f"Input_variant_{i}.docx", buf.getvalue()))
+    return variants
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # Peak rather than current RSS, but still an upper bound (KiB on Linux).
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StageRecorder:
+    """
+    Collects per-stage durations from review_file's progress callback and
+    samples RSS in the background, attributing each sample to every stage
+    that some request is currently in.
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self.peak_rss = {}
+        self._current = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def progress(self, filename, stage):
+        now = time.perf_counter()
+        with self._lock:
+            previous = self._current.pop(filename, None)
+            if previous is not None:
+                prev_stage, started = previous
+                self.durations.setdefault(prev_stage, []).append(now - started)
+            if stage != "done":
+                self._current[filename] = (stage, now)
+                self._note_rss(stage, current_rss_mb())
+
+    def _note_rss(self, stage, rss):
+        self.peak_rss[stage] = max(self.peak_rss.get(stage, 0.0), rss)
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            rss = current_rss_mb()
+            with self._lock:
+                for stage, _ in self._current.values():
+                    self._note_rss(stage, rss)
+
+
+def run_in_process(variants, concurrency):
+    from src.pipeline import review_file, STAGES
+    from src.utils import llm_client
+
+    recorder = StageRecorder()
+    latencies = []
+    first_issue = []
+    spans = {}
+
+    def one(filename, data):
+        started = time.perf_counter()
+        result = review_file(filename, data, recorder.progress)
+        latencies.append(time.perf_counter() - started)
+        if result.get("first_issue_seconds") is not None:
+            first_issue.append(result["first_issue_seconds"])
+        for name, seconds in result.get("spans", {}).items():
+            spans.setdefault(name, []).append(seconds)
+
+    recorder.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for fut in [pool.submit(one, name, data) for name, data in variants]:
+            fut.result()
+    elapsed = time.perf_counter() - started
+    recorder.stop()
+
+    print(f"{'stage':<10} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'peak RSS MB':>12}")
+    for stage in STAGES:
+        values = recorder.durations.get(stage, [])
+        print(f"{stage:<10} {percentile(values, 50):>8.3f} {percentile(values, 95):>8.3f} "
+              f"{percentile(values, 99):>8.3f} {recorder.peak_rss.get(stage, 0.0):>12.1f}")
+    print(f"\n{'span':<14} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8}")
+    for name, values in spans.items():
+        print(f"{name:<14} {percentile(values, 50):>8.3f} {percentile(values, 95):>8.3f} {percentile(values, 99):>8.3f}")
+    if first_issue:
+        print(f"\ntime to first issue: p50 {percentile(first_issue, 50):.3f}s, p95 {percentile(first_issue, 95):.3f}s")
+    print(f"llm client: {llm_client.stats()}")
+    return latencies, elapsed
+
+
+def run_http(variants, concurrency, url):
+    import httpx
+
+    latencies = []
+    client = httpx.Client(base_url=url, timeout=None)
+
+    def one(filename, data):
+        started = time.perf_counter()
+        resp = client.post("/review", files={"files": (filename, data)})
+        resp.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for fut in [pool.submit(one, name, data) for name, data in variants]:
+            fut.result()
+    elapsed = time.perf_counter() - started
+    client.close()
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=1, help="copies of the sample body per document")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub LLM seconds per call")
+    parser.add_argument("--url", help="POST to a running server instead of reviewing in-process")
+    parser.add_argument("--real-backends", action="store_true", help="use Gemini and the real embedding model")
+    parser.add_argument("--use-cache", action="store_true", help="keep the LLM and embedding caches enabled")
+    args = parser.parse_args()
+
+    # Configuration is read at import time, so set it before importing src.
+    if not args.real_backends:
+        os.environ.setdefault("LLM_BACKEND", "fake")
+        os.environ.setdefault("EMBED_BACKEND", "hash")
+        os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "0")
+        os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "0")
+        os.environ["STUB_LLM_LATENCY_SECONDS"] = str(args.llm_latency)
+    if not args.use_cache:
+        os.environ.setdefault("LLM_CACHE_DISABLED", "1")
+        os.environ.setdefault("EMBED_CACHE_DISABLED", "1")
+
+    variants = build_variants(args.requests, args.repeat)
+    print(f"{len(variants)} requests, concurrency {args.concurrency}, "
+          f"{len(variants[0][1]) / 1024:.0f} KiB per upload")
+
+    if args.url:
+        latencies, elapsed = run_http(variants, args.concurrency, args.url)
+    else:
+        latencies, elapsed = run_in_process(variants, args.concurrency)
+
+    print(f"end-to-end latency: p50 {percentile(latencies, 50):.3f}s, p95 {percentile(latencies, 95):.3f}s, "
+          f"p99 {percentile(latencies, 99):.3f}s")
+    print(f"throughput: {len(latencies) / elapsed:.2f} requests/s ({elapsed:.2f}s total)")
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Multi-process serving: gunicorn pre-forks Uvicorn workers from a master that
+has already loaded the shared, read-only state.
+
+    gunicorn main:app -c gunicorn.conf.py
+
+The embedding model and, with RETRIEVAL_BACKEND=numpy, the memory-mapped
+vector and BM25 indexes are loaded once in the master before the fork. Every
+worker then shares them copy-on-write instead of loading its own copy.
+gc.freeze() keeps the collector from writing to, and so copying, those pages.
+Components that own sockets, threads or SQLite handles (the Chroma client,
+the Gemini SDK, the LLM and embedding caches) are not touched here. Each
+worker creates its own on first use.
+"""
+import gc
+import os
+import time
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_MODELS", "1") == "1"
+# Reviews run for tens of seconds while Gemini answers.
+timeout = int(os.getenv("WORKER_TIMEOUT", "300"))
+graceful_timeout = 30
+
+# The tokenizer's thread pool must not be started before the fork.
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported and before any worker is forked."""
+    if not preload_app:
+        return
+    from src.utils import get_embed_model
+    from src.retriever import RETRIEVAL_BACKEND, RETRIEVAL_MODE
+
+    timings = {}
+    started = time.perf_counter()
+    get_embed_model()
+    timings["embed_model"] = round(time.perf_counter() - started, 3)
+    if RETRIEVAL_BACKEND == "numpy":
+        from src.vector_index import get_vector_index
+
+        started = time.perf_counter()
+        try:
+            get_vector_index()
+        except FileNotFoundError as e:
+            server.log.warning(f"No vector index to preload ({e}); workers will load it on first use.")
+        timings["vector_index"] = round(time.perf_counter() - started, 3)
+    if RETRIEVAL_MODE == "hybrid":
+        from src.bm25_index import get_bm25_index
+
+        started = time.perf_counter()
+        try:
+            get_bm25_index()
+        except FileNotFoundError as e:
+            server.log.warning(f"No BM25 index to preload ({e}); workers will load it on first use.")
+        timings["bm25_index"] = round(time.perf_counter() - started, 3)
+    gc.freeze()
+    server.log.info(f"Preloaded shared state before forking {workers} workers: {timings}")
@@ -1,18 +1,18 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
-from pathlib import Path
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import asyncio
 import json
+import os
 import time
-import shutil
 
-from src.parser import parse_document
-from src.classifier import classify_document
-from src.retriever import retrieve_reference
-from src.missing_docs_checker import check_missing_documents
-from src.red_flag_detector import detect_red_flags, add_comments_to_docx  
+from src.pipeline import review_file, build_report, write_report, REPORT_TIMING_BREAKDOWN
+from src.jobs import JobManager, COMPLETED, FAILED
+from src.utils import warmup, warm_state, llm_client, embedding_cache, embed_batcher, EMBEDDING
+from src.llm_cache import llm_cache
+from src import metrics
 
 app = FastAPI(title="ADGM Corporate Agent")
 
@@ -24,70 +24,123 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-OUTPUT_DIR = Path("outputs")
-OUTPUT_DIR.mkdir(exist_ok=True)
-TEMP_DIR = Path(tempfile.gettempdir())
+SUPPORTED_EXTENSIONS = (".docx", ".pdf")
 
-@app.post("/review")
-async def review_documents(files: List[UploadFile] = File(...)):
-    if not files:
-        raise HTTPException(status_code=400, detail="No files uploaded.")
+# Maximum number of files reviewed at the same time across all requests.
+# Each file's pipeline is blocking, so it runs in this pool to keep the
+# event loop free for other requests.
+REVIEW_CONCURRENCY = max(1, int(os.getenv("REVIEW_CONCURRENCY", "4")))
+review_executor = ThreadPoolExecutor(max_workers=REVIEW_CONCURRENCY, thread_name_prefix="review")
+
+job_manager = JobManager(review_executor, REVIEW_CONCURRENCY)
+
+SSE_POLL_SECONDS = 0.5
 
-    all_issues_found = []
-    detected_doc_types = []
-    output_file_paths = {}
 
+async def _read_uploads(files: List[UploadFile]):
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded.")
+    uploads = []
     for file in files:
-        if not file.filename.lower().endswith(".docx"):
+        if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
             continue
+        uploads.append((file.filename, await file.read()))
+    return uploads
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness check; reports which lazily-loaded components are initialised."""
+    return {"status": "ok", "warm": warm_state()}
+
 
-        tmp_path = TEMP_DIR / f"{int(time.time())}_{file.filename}"
-        with open(tmp_path, "wb") as f:
-            f.write(await file.read())
-
-        
-        text = parse_document(tmp_path)
-
-      
-        doc_type = classify_document(text)
-        detected_doc_types.append(doc_type)
-
-       
-        ref_text, meta = retrieve_reference(text, doc_type=doc_type)
-
-       
-        issues = detect_red_flags(text, ref_text)
-
-        
-        commented_docx_path = OUTPUT_DIR / f"reviewed_{file.filename}"
-        try:
-            add_comments_to_docx(tmp_path, issues, commented_docx_path, debug=True)
-        except Exception as e:
-            print(f"[main.py] Failed to add comments to {file.filename}: {e}")
-            shutil.copy(tmp_path, commented_docx_path)
-
-        output_file_paths[file.filename] = str(commented_docx_path)
-
-        
-        for issue in issues:
-            issue["document"] = file.filename
-            all_issues_found.append(issue)
-
-   
-    missing_docs_report = check_missing_documents(detected_doc_types)
-
-    
-    result = {
-        "process": missing_docs_report["process"],
-        "documents_uploaded": len(detected_doc_types),
-        "required_documents": missing_docs_report["required_count"],
-        "missing_documents": missing_docs_report["missing_docs"],
-        "issues_found": all_issues_found,
-        "reviewed_documents": output_file_paths,
+@app.get("/stats")
+async def stats():
+    """Gemini client queue/latency counters, cache hit rates and embedding batch sizes."""
+    return {
+        "llm": llm_client.stats(),
+        "llm_cache": llm_cache.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "embedding_batcher": embed_batcher.stats(),
+        "embedding_backend": EMBEDDING,
     }
 
-    json_path = OUTPUT_DIR / f"report_{int(time.time())}.json"
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: span latency, prompt size and issue histograms, cache and LLM counters."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/warmup")
+async def warmup_models():
+    """Loads the embedding model, Chroma client and Gemini SDK ahead of the first review."""
+    loop = asyncio.get_running_loop()
+    timings = await loop.run_in_executor(review_executor, warmup)
+    return {"status": "ok", "timings": timings, "warm": warm_state()}
+
+
+@app.post("/review")
+async def review_documents(files: List[UploadFile] = File(...), breakdown: bool = REPORT_TIMING_BREAKDOWN):
+    uploads = await _read_uploads(files)
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    # gather() keeps the results in upload order regardless of completion order.
+    results = await asyncio.gather(*[
+        loop.run_in_executor(review_executor, review_file, filename, data)
+        for filename, data in uploads
+    ])
+
+    result = build_report(results, time.perf_counter() - started, REVIEW_CONCURRENCY, breakdown=breakdown)
+    write_report(result)
 
     return JSONResponse(content=result)
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(files: List[UploadFile] = File(...), breakdown: bool = REPORT_TIMING_BREAKDOWN):
+    """Queues a review and returns its job id immediately."""
+    uploads = await _read_uploads(files)
+    job = job_manager.submit(uploads, breakdown=breakdown)
+    return {"job_id": job.id, "status": job.status, "files": job.files}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Current status, progress events and, once completed, the report."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events stream of a job's per-file, per-stage progress and
+    of each red flag ("issue" events) as soon as it is found.
+    Reconnecting clients resume after the Last-Event-ID they received; the
+    stream ends with a "done" event carrying the final job state.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+
+    async def events():
+        sent = start
+        while True:
+            # One consistent snapshot per poll, so no event is missed between reads.
+            current = job_manager.get(job_id).to_dict()
+            for event in current["events"][sent:]:
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            sent = len(current["events"])
+            if current["status"] in (COMPLETED, FAILED):
+                yield f"event: done\ndata: {json.dumps(current, ensure_ascii=False)}\n\n"
+                return
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(SSE_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
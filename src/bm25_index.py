@@ -0,0 +1,156 @@
+"""
+Sparse BM25 index over the reference chunks, for exact legal terms
+("ADGM Courts", "Registrar", article numbers) that dense embeddings blur.
+
+Postings are stored in CSR form as flat NumPy arrays: for term t, the chunk
+rows and term frequencies are doc_ids[offsets[t]:offsets[t + 1]] and
+tfs[offsets[t]:offsets[t + 1]]. The arrays are saved uncompressed next to a
+JSON side table and memory-mapped on load, so start-up does not parse
+postings, and a query only touches the postings of its own terms.
+
+Built at the end of ingestion (see data_ingest.ingest()).
+"""
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+BM25_INDEX_DIR = Path(os.getenv("BM25_INDEX_DIR", "data_sources/bm25_index"))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Dotted article/clause numbers ("17.2") are kept whole.
+_TOKEN = re.compile(r"\d+(?:\.\d+)+|[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or shall that the this to was were which with"
+    .split()
+)
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, root: Path = BM25_INDEX_DIR):
+        self.root = Path(root)
+        with open(self.root / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.vocab = {term: i for i, term in enumerate(meta["terms"])}
+        self.ids = meta["ids"]
+        self.documents = meta["documents"]
+        self.metadatas = meta["metadatas"]
+        self.offsets = np.load(self.root / "offsets.npy")
+        self.doc_ids = np.load(self.root / "doc_ids.npy", mmap_mode="r")
+        self.tfs = np.load(self.root / "tfs.npy", mmap_mode="r")
+        self.doc_len = np.load(self.root / "doc_len.npy")
+        self.avg_len = float(self.doc_len.mean()) if len(self.doc_len) else 0.0
+        n = len(self.ids)
+        df = np.diff(self.offsets)
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        # Length normalisation term of the BM25 denominator, per chunk.
+        self._norm = (BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len / (self.avg_len or 1.0))).astype(np.float32)
+        self._masks = {}
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _mask(self, where):
+        key = tuple(sorted(where.items()))
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self._masks[key] = np.array(
+                [all((m or {}).get(k) == v for k, v in where.items()) for m in self.metadatas], dtype=bool)
+        return mask
+
+    def scores(self, text: str) -> np.ndarray:
+        """BM25 score of every chunk for the (deduplicated) terms of text."""
+        terms = np.array([t for t in map(self.vocab.get, set(tokenize(text))) if t is not None], dtype=np.int64)
+        if not len(terms):
+            return np.zeros(len(self.ids), dtype=np.float32)
+        # Gather every posting of every query term in one vectorised step.
+        starts = self.offsets[terms]
+        lengths = self.offsets[terms + 1] - starts
+        positions = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        docs = self.doc_ids[positions]
+        tf = self.tfs[positions]
+        weights = np.repeat(self.idf[terms], lengths) * tf * (BM25_K1 + 1) / (tf + self._norm[docs])
+        return np.bincount(docs, weights=weights, minlength=len(self.ids)).astype(np.float32)
+
+    def query(self, text: str, n_results: int = 1, where: dict = None) -> dict:
+        """Top-k chunks by BM25 score, as {"ids", "documents", "metadatas", "scores"} lists."""
+        scores = self.scores(text)
+        if where:
+            scores[~self._mask(where)] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        k = min(n_results, len(candidates))
+        if k <= 0:
+            return {"ids": [], "documents": [], "metadatas": [], "scores": []}
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return {
+            "ids": [self.ids[i] for i in top],
+            "documents": [self.documents[i] for i in top],
+            "metadatas": [self.metadatas[i] for i in top],
+            "scores": [float(scores[i]) for i in top],
+        }
+
+
+def build_bm25_index(ids, documents, metadatas, root: Path = BM25_INDEX_DIR):
+    """Tokenises the chunks and writes the CSR postings and side table."""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    vocab = {}
+    postings = []
+    doc_len = np.zeros(len(ids), dtype=np.float32)
+    for row, text in enumerate(documents):
+        counts = {}
+        tokens = tokenize(text)
+        doc_len[row] = len(tokens)
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            t = vocab.setdefault(token, len(vocab))
+            postings.append((t, row, tf))
+
+    postings.sort()
+    terms = np.array([p[0] for p in postings], dtype=np.int32)
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=len(vocab)), out=offsets[1:])
+    doc_ids = np.array([p[1] for p in postings], dtype=np.int32)
+    tfs = np.array([p[2] for p in postings], dtype=np.float32)
+
+    for name, array in (("offsets", offsets), ("doc_ids", doc_ids), ("tfs", tfs), ("doc_len", doc_len)):
+        tmp_path = root / f"{name}.npy.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        tmp_path.replace(root / f"{name}.npy")
+
+    meta = {
+        "terms": sorted(vocab, key=vocab.get),
+        "ids": list(ids),
+        "documents": list(documents),
+        "metadatas": list(metadatas),
+    }
+    tmp_meta = root / "meta.json.tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    tmp_meta.replace(root / "meta.json")
+    print(f"[bm25_index] Indexed {len(ids)} chunks, {len(vocab)} terms, {len(doc_ids)} postings")
+
+
+def get_bm25_index(root: Path = BM25_INDEX_DIR) -> BM25Index:
+    """Shared index, loaded on first use and reloaded after a newer build."""
+    global _index
+    mtime = (Path(root) / "meta.json").stat().st_mtime_ns
+    if _index is None or _index[0] != mtime:
+        with _index_lock:
+            if _index is None or _index[0] != mtime:
+                _index = (mtime, BM25Index(root))
+    return _index[1]
@@ -1,6 +1,12 @@
-
+import os
 import re
-from src.utils import gemini_generate
+import threading
+
+import numpy as np
+
+from src.utils import gemini_generate, embed_texts
+from src.retriever import get_reference_collection
+from src.metrics import CLASSIFIER_TIERS
 
 
 _CANONICAL_MAP = {
@@ -23,34 +29,146 @@ _CANONICAL_MAP = {
     "lease agreement": "Lease Agreement"
 }
 
+_NON_WORD = re.compile(r"[^a-z0-9\s']")
+
+# Keys are normalised once, the same way as the text they are matched against.
+_KEYS = [(" ".join(_NON_WORD.sub(" ", key).split()), canon) for key, canon in _CANONICAL_MAP.items()]
+_KEY_WORDS = [(key.split()[:2], canon) for key, canon in _KEYS]
+# Whole-phrase matches only, for short titles such as file names and header lines.
+_TITLE_PATTERNS = [(re.compile(rf"\b{re.escape(key)}\b"), canon) for key, canon in _KEYS]
+
+# Tier 1 looks for a label in the header region only; tier 2 compares the
+# document head with one embedding prototype per label.
+CLASSIFY_HEADER_LINES = 6
+CLASSIFY_HEADER_CHARS = 2000
+CLASSIFY_EMBED_CHARS = int(os.getenv("CLASSIFY_EMBED_CHARS", "2000"))
+CLASSIFY_EMBED_THRESHOLD = float(os.getenv("CLASSIFY_EMBED_THRESHOLD", "0.5"))
+CLASSIFY_EMBED_MARGIN = float(os.getenv("CLASSIFY_EMBED_MARGIN", "0.05"))
+CLASSIFY_PROTOTYPE_CHUNKS = 200
+
+_prototypes = None
+_prototypes_lock = threading.Lock()
+
+
 def _normalize_label(s: str):
     if not s:
         return None
-    s = s.lower()
-    s = re.sub(r'[^a-z0-9\s\']', ' ', s)
-    for key, canon in _CANONICAL_MAP.items():
+    s = _NON_WORD.sub(" ", s.lower())
+    for key, canon in _KEYS:
         if key in s:
             return canon
-    
-    for key, canon in _CANONICAL_MAP.items():
-        key_words = key.split()
-        if all(k in s for k in key_words[:2]):  # require first 2 words
+
+    for key_words, canon in _KEY_WORDS:
+        if all(k in s for k in key_words):  # require first 2 words
             return canon
     return None
 
-def classify_document(text: str) -> str:
-    head = text.strip().splitlines()
-    
-    for i in range(min(6, len(head))):
-        candidate = head[i].strip()
-        norm = _normalize_label(candidate)
+
+def _label_from_source(meta: dict):
+    if meta.get("doc_type") in _CANONICAL_MAP.values():
+        return meta["doc_type"]
+    return _normalize_label(str(meta.get("source") or ""))
+
+
+def _build_prototypes():
+    """
+    One unit vector per label: the mean of the label's own name and of the
+    reference chunks attributed to it (by their doc_type metadata, or by
+    their source file name).
+    """
+    labels = sorted(set(_CANONICAL_MAP.values()))
+    vectors = {label: [np.asarray(v, dtype=np.float32)] for label, v in zip(labels, embed_texts(labels))}
+    try:
+        col = get_reference_collection()
+        res = col.get(include=["embeddings", "metadatas"], limit=CLASSIFY_PROTOTYPE_CHUNKS * len(labels))
+        embeddings = res.get("embeddings")
+        for emb, meta in zip(embeddings if embeddings is not None else [], res.get("metadatas") or []):
+            label = _label_from_source(meta or {})
+            if label in vectors and len(vectors[label]) <= CLASSIFY_PROTOTYPE_CHUNKS:
+                vectors[label].append(np.asarray(emb, dtype=np.float32))
+    except Exception as e:
+        print(f"[classifier] Reference corpus unavailable for prototypes, using label names only: {e}")
+
+    matrix = np.stack([np.mean(vectors[label], axis=0) for label in labels])
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    return labels, matrix
+
+
+def get_prototypes():
+    global _prototypes
+    if _prototypes is None:
+        with _prototypes_lock:
+            if _prototypes is None:
+                _prototypes = _build_prototypes()
+    return _prototypes
+
+
+def nearest_prototype(text: str):
+    """
+    Returns (label, cosine similarity) of the closest label prototype; label
+    is None when the match is too weak or too close to the runner-up.
+    """
+    labels, matrix = get_prototypes()
+    query = np.asarray(embed_texts([text[:CLASSIFY_EMBED_CHARS]])[0], dtype=np.float32)
+    query /= np.linalg.norm(query) + 1e-12
+    scores = matrix @ query
+    order = np.argsort(scores)[::-1]
+    best = float(scores[order[0]])
+    runner_up = float(scores[order[1]]) if len(order) > 1 else -1.0
+    if best < CLASSIFY_EMBED_THRESHOLD or best - runner_up < CLASSIFY_EMBED_MARGIN:
+        return None, best
+    return labels[order[0]], best
+
+
+def match_title(title: str, anchored: bool = False):
+    """
+    The canonical label named as a whole phrase in a title (a file name or a
+    heading), or None. Unlike _normalize_label there is no substring or
+    first-two-words matching, so "standard" does not match "nda". With
+    anchored=True the title must start with the label.
+    """
+    title = " ".join(_NON_WORD.sub(" ", (title or "").lower().replace("_", " ")).split())
+    for pattern, canon in _TITLE_PATTERNS:
+        match = pattern.match(title) if anchored else pattern.search(title)
+        if match:
+            return canon
+    return None
+
+
+def classify_header(text: str):
+    """
+    Tier 1: the canonical label named as a whole phrase in one of the first
+    lines of text, or None ("The standard terms apply" does not name an NDA).
+    """
+    header = text.strip()[:CLASSIFY_HEADER_CHARS].splitlines()
+    for line in header[:CLASSIFY_HEADER_LINES]:
+        norm = match_title(line)
         if norm:
             return norm
-    
-    norm = _normalize_label(text)
+    return None
+
+
+def _classify(text: str):
+    """
+    Returns (doc_type, tier), trying the cheapest tier first:
+      "header"    - a label in one of the first lines
+      "embedding" - nearest label prototype in embedding space
+      "llm"       - Gemini
+    tier is "none" when every tier failed and doc_type is "Unknown". The body
+    is never scanned for label keywords: words such as "termination" occur in
+    most contracts, so a match there says nothing about the document type.
+    """
+    norm = classify_header(text)
     if norm:
-        return norm
-    
+        return norm, "header"
+
+    try:
+        norm, _ = nearest_prototype(text)
+        if norm:
+            return norm, "embedding"
+    except Exception as e:
+        print(f"[classifier] Embedding tier failed: {e}")
+
     prompt = (
         "Identify the ADGM document type in one short label (e.g. 'Shareholder Resolution', "
         "'Articles of Association', 'Employment Contract') based on this text:\n\n"
@@ -61,8 +179,19 @@ def classify_document(text: str) -> str:
         resp_label = resp.strip().splitlines()[0]
         norm = _normalize_label(resp_label)
         if norm:
-            return norm
-        
-        return resp_label.strip()
+            return norm, "llm"
+
+        return resp_label.strip(), "llm"
     except Exception:
-        return "Unknown"
+        return "Unknown", "none"
+
+
+def classify_document_with_tier(text: str):
+    """Classifies text (see _classify) and counts the tier that answered in adgm_classifier_tier_total."""
+    doc_type, tier = _classify(text)
+    CLASSIFIER_TIERS.inc(tier=tier)
+    return doc_type, tier
+
+
+def classify_document(text: str) -> str:
+    return classify_document_with_tier(text)[0]
@@ -0,0 +1,128 @@
+"""
+Token-budgeted packing of retrieved reference chunks into prompt context.
+
+Ingestion cuts each source into overlapping word windows (data_ingest.chunk_text),
+so neighbouring chunks of one source share their boundary words, and joining
+ranked chunks naively sends that text to the LLM twice. pack_references()
+takes candidates in relevance order and admits each one while the packed
+context still fits the token budget. Consecutive chunks of the same source
+are merged into one passage with the overlap dropped. Each passage is
+labelled with a numbered citation.
+"""
+import os
+
+from src.llm_client import estimate_tokens
+
+REFERENCE_TOKEN_BUDGET = int(os.getenv("REFERENCE_TOKEN_BUDGET", "3000"))
+# Longest overlap looked for between consecutive chunks; ingestion uses 100 words.
+MAX_OVERLAP_WORDS = 200
+
+
+def _overlap(prev_words: list, next_words: list, limit: int = MAX_OVERLAP_WORDS) -> int:
+    """Length of the longest suffix of prev_words that is also a prefix of next_words."""
+    for n in range(min(limit, len(prev_words), len(next_words)), 0, -1):
+        if prev_words[-n:] == next_words[:n]:
+            return n
+    return 0
+
+
+def _chunk_index(ref: dict):
+    chunk = (ref.get("metadata") or {}).get("chunk")
+    return chunk if isinstance(chunk, int) else None
+
+
+def _passages(selected: list) -> list:
+    """
+    Groups selected chunks into passages: runs of consecutive chunk numbers
+    from one source become a single passage. Passages are ordered by their
+    most relevant chunk.
+    """
+    runs = []
+    by_source = {}
+    for rank, ref in enumerate(selected):
+        source = (ref.get("metadata") or {}).get("source")
+        index = _chunk_index(ref)
+        if source is None or index is None:
+            runs.append({"rank": rank, "refs": [ref]})
+            continue
+        by_source.setdefault(source, []).append((index, rank, ref))
+
+    for chunks in by_source.values():
+        chunks.sort(key=lambda c: c[0])
+        run = None
+        for index, rank, ref in chunks:
+            if run is not None and index == run["last"] + 1:
+                run["refs"].append(ref)
+                run["rank"] = min(run["rank"], rank)
+            else:
+                run = {"rank": rank, "refs": [ref]}
+                runs.append(run)
+            run["last"] = index
+
+    passages = []
+    for run in sorted(runs, key=lambda r: r["rank"]):
+        words = []
+        for ref in run["refs"]:
+            chunk_words = ref["text"].split()
+            words.extend(chunk_words[_overlap(words, chunk_words):])
+        passages.append({"refs": run["refs"], "text": " ".join(words)})
+    return passages
+
+
+def _render(passages: list) -> str:
+    blocks = []
+    for n, passage in enumerate(passages, start=1):
+        meta = passage["refs"][0].get("metadata") or {}
+        blocks.append(f"[{n}] {meta.get('source') or 'Reference'}\n{passage['text']}")
+    return "\n\n".join(blocks)
+
+
+def pack_references(refs: list, budget: int = REFERENCE_TOKEN_BUDGET):
+    """
+    Packs ranked reference dicts (id, text, metadata, score) into at most
+    budget tokens. A candidate that would overflow the budget is skipped
+    and smaller, less relevant ones may still fit. If not even the best
+    candidate fits, it is truncated to the budget so the prompt keeps some
+    grounding. Returns (text, citations, stats). citations has one entry per
+    passage, numbered as in the text. stats compares the packed tokens with
+    the tokens of all candidates joined naively.
+    """
+    selected = []
+    seen_texts = set()
+    text = ""
+    for ref in refs:
+        key = " ".join(ref["text"].split())
+        if not key or key in seen_texts:
+            continue
+        candidate = _render(_passages(selected + [ref]))
+        if estimate_tokens(candidate) > budget:
+            continue
+        seen_texts.add(key)
+        selected.append(ref)
+        text = candidate
+
+    if not selected and refs:
+        selected = refs[:1]
+        text = _render(_passages(selected))[:max(budget, 0) * 4]
+
+    citations = []
+    for n, passage in enumerate(_passages(selected), start=1):
+        meta = passage["refs"][0].get("metadata") or {}
+        chunks = [_chunk_index(ref) for ref in passage["refs"]]
+        citations.append({
+            "ref": n,
+            "source": meta.get("source"),
+            "url": meta.get("url"),
+            "doc_type": meta.get("doc_type"),
+            "chunks": [c for c in chunks if c is not None],
+            "tokens": estimate_tokens(passage["text"]),
+        })
+
+    stats = {
+        "budget_tokens": budget,
+        "candidate_chunks": len(refs),
+        "packed_chunks": len(selected),
+        "candidate_tokens": estimate_tokens("\n\n".join(ref["text"] for ref in refs)),
+        "packed_tokens": estimate_tokens(text),
+    }
+    return text, citations, stats
@@ -1,84 +1,430 @@
+import hashlib
+import json
+import multiprocessing
+import os
 import re
 import requests
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 import docx2txt
-import pdfplumber
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
-from src.utils import embed_texts, chroma_client
+from urllib3.util.retry import Retry
+from src.pdf_extract import extract_pdf_pages
+from src.utils import embed_texts, get_chroma_client, embedding_cache, embedding_metadata, EMBED_MODEL_NAME, EMBED_BACKEND
+from src.embedding_backends import embedding_mismatches
+from src.classifier import match_title
+from src.retriever import partition_name, COLLECTION_NAME
+from src.vector_index import export_collection
+from src.bm25_index import build_bm25_index
 
 DATA_SRC_DOCX = Path("Data Sources.docx")
 DOWNLOAD_DIR = Path("data_sources")
 DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+MANIFEST_PATH = DOWNLOAD_DIR / "ingest_manifest.json"
+# doc_type of reference sources that are not one of the canonical document
+# types (regulations, guidance notes, ...).
+UNTYPED_DOC_TYPE = "General"
+# Leading words of a source's first chunk treated as its title. Chunks are
+# whitespace-joined, so the title line cannot be told apart from the body.
+REFERENCE_TITLE_WORDS = 12
+# Version of the reference_doc_type rules, recorded per source in the manifest.
+# Unchanged sources tagged by other rules (or never tagged) are re-extracted
+# once so their chunks are re-tagged and written to the right partition.
+DOC_TYPE_TAGGER = 2
+UPSERT_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+DOWNLOAD_WORKERS = int(os.getenv("INGEST_DOWNLOAD_WORKERS", "8"))
+EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
 
 def extract_links_from_docx(docx_path):
     text = docx2txt.process(str(docx_path))
     return list(dict.fromkeys(re.findall(r'(https?://[^\s)]+)', text)))
 
-def download_file(url):
-    local_path = DOWNLOAD_DIR / Path(url.split("?")[0]).name
+def make_session(pool_size=DOWNLOAD_WORKERS):
+    """A requests session whose connection pool is sized for the download workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504)),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def download_file(url, session=None, download_dir=DOWNLOAD_DIR):
+    local_path = Path(download_dir) / Path(url.split("?")[0]).name
     if local_path.exists():
         return local_path
+    tmp_path = local_path.with_name(local_path.name + ".part")
     try:
-        r = requests.get(url, timeout=30)
+        r = (session or requests).get(url, timeout=30, stream=True)
         r.raise_for_status()
-        with open(local_path, "wb") as f:
-            f.write(r.content)
+        with open(tmp_path, "wb") as f:
+            for block in r.iter_content(chunk_size=1 << 16):
+                f.write(block)
+        tmp_path.replace(local_path)
         return local_path
     except Exception as e:
         print(f"Download failed for {url}: {e}")
+        tmp_path.unlink(missing_ok=True)
         return None
 
-def extract_text(path):
+def download_all(urls, session=None, workers=DOWNLOAD_WORKERS, download_dir=DOWNLOAD_DIR):
+    """Downloads urls on a thread pool and yields (url, local_path) as each finishes."""
+    session = session or make_session(workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as pool:
+        futures = {pool.submit(download_file, url, session, download_dir): url for url in urls}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield futures[fut], fut.result()
+
+def iter_text(path, workers=None):
+    """Yields a source's text in pieces (one per PDF page) so it can be chunked incrementally."""
     if path.suffix.lower() == ".docx":
-        return docx2txt.process(str(path))
+        yield docx2txt.process(str(path))
     elif path.suffix.lower() == ".pdf":
-        text = ""
-        with pdfplumber.open(str(path)) as pdf:
-            for page in pdf.pages:
-                text += page.extract_text() or ""
-        return text
-    return ""
+        yield from extract_pdf_pages(path, workers=workers)
+
+def extract_text(path):
+    return "\n".join(iter_text(path))
+
+def chunk_stream(pieces, size=800, overlap=100):
+    """
+    Incremental equivalent of chunk_text: consumes text pieces (e.g. PDF
+    pages) and yields the same overlapping word windows as soon as enough
+    words have arrived, without materialising the whole text.
+    """
+    step = size - overlap
+    buffer = []
+    for piece in pieces:
+        buffer.extend(piece.split())
+        while len(buffer) >= size:
+            yield " ".join(buffer[:size])
+            del buffer[:step]
+    while buffer:
+        yield " ".join(buffer[:size])
+        del buffer[:step]
 
 def chunk_text(text, size=800, overlap=100):
-    words = text.split()
-    return [
-        " ".join(words[i:i + size])
-        for i in range(0, len(words), size - overlap)
-    ]
+    return list(chunk_stream([text], size, overlap))
+
+def extract_chunks(path_str):
+    """
+    Process-pool entry point: extracts and chunks one downloaded source.
+    Ingestion already runs one source per worker, so pages are read serially here.
+    """
+    return list(chunk_stream(iter_text(Path(path_str), workers=1)))
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def sha256_file(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_manifest():
+    """
+    The manifest records, per source file, its URL, file hash and the id/hash
+    of every chunk stored in Chroma, plus the embedding backend, model and
+    dimension that produced the vectors. Returns None when no manifest has
+    been written yet.
+    """
+    if not MANIFEST_PATH.exists():
+        return None
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(MANIFEST_PATH)
+
+
+def reference_doc_type(name, chunks):
+    """
+    Canonical document type of a reference source: a label named as a whole
+    phrase in its file name, or one its first chunk starts with (the title).
+    Body text is never scanned, so regulations and guides that merely mention
+    a document type stay UNTYPED_DOC_TYPE.
+    """
+    title = " ".join(chunks[0].split()[:REFERENCE_TITLE_WORDS]) if chunks else ""
+    return match_title(Path(name).stem) or match_title(title, anchored=True) or UNTYPED_DOC_TYPE
+
+
+def _tag_is_current(prev, name):
+    """Whether an unchanged source's recorded doc_type is what reference_doc_type gives it now."""
+    if not prev.get("doc_type"):
+        return False
+    name_type = match_title(Path(name).stem)
+    if name_type:
+        return prev["doc_type"] == name_type
+    # The title comes from the extracted text, which only the same rules tag the same way.
+    return prev.get("tagger") == DOC_TYPE_TAGGER
+
+
+class _ChunkWriter:
+    """
+    Buffers chunk writes and flushes them to Chroma in fixed-size batches, so
+    only one batch of texts and embeddings is held in memory at a time.
+
+    Every chunk is written to the shared collection and to the partition
+    collection of its doc_type, reusing the same embeddings. Partitions are
+    created with the same embedding metadata as the shared collection.
+    """
+
+    def __init__(self, col, client=None, batch_size=UPSERT_BATCH_SIZE, metadata=None):
+        self.col = col
+        self.client = client
+        self.metadata = metadata
+        self._partitions = {}
+        self.batch_size = batch_size
+        self._upserts = []
+        self._relabels = []
+        self.embedded = 0
+        self.kept = 0
+
+    def upsert(self, item):
+        self._upserts.append(item)
+        if len(self._upserts) >= self.batch_size:
+            self._flush_upserts()
+
+    def relabel(self, item):
+        self._relabels.append(item)
+        if len(self._relabels) >= self.batch_size:
+            self._flush_relabels()
+
+    def partition(self, doc_type):
+        col = self._partitions.get(doc_type)
+        if col is None:
+            col = self._partitions[doc_type] = self.client.get_or_create_collection(
+                partition_name(doc_type), metadata=self.metadata)
+        return col
+
+    def _by_partition(self, batch):
+        groups = {}
+        for i, c in enumerate(batch):
+            groups.setdefault(c["meta"]["doc_type"], []).append(i)
+        return groups.items()
+
+    def _flush_upserts(self):
+        if not self._upserts:
+            return
+        batch, self._upserts = self._upserts, []
+        embeddings = embed_texts([c["text"] for c in batch])
+        self.col.upsert(
+            ids=[c["id"] for c in batch],
+            embeddings=embeddings,
+            metadatas=[c["meta"] for c in batch],
+            documents=[c["text"] for c in batch]
+        )
+        if self.client is not None:
+            for doc_type, rows in self._by_partition(batch):
+                self.partition(doc_type).upsert(
+                    ids=[batch[i]["id"] for i in rows],
+                    embeddings=[embeddings[i] for i in rows],
+                    metadatas=[batch[i]["meta"] for i in rows],
+                    documents=[batch[i]["text"] for i in rows]
+                )
+        self.embedded += len(batch)
+
+    def _flush_relabels(self):
+        if not self._relabels:
+            return
+        batch, self._relabels = self._relabels, []
+        self.col.update(ids=[c["id"] for c in batch], metadatas=[c["meta"] for c in batch])
+        if self.client is not None:
+            for doc_type, rows in self._by_partition(batch):
+                self.partition(doc_type).update(
+                    ids=[batch[i]["id"] for i in rows],
+                    metadatas=[batch[i]["meta"] for i in rows]
+                )
+        self.kept += len(batch)
+
+    def delete(self, ids, partition_ids):
+        """Deletes ids from the shared collection and {doc_type: ids} from the partitions."""
+        if ids:
+            self.col.delete(ids=ids)
+        if self.client is not None:
+            for doc_type, stale in partition_ids.items():
+                if stale:
+                    self.partition(doc_type).delete(ids=stale)
+
+    def flush(self):
+        self._flush_relabels()
+        self._flush_upserts()
+
+
+def _index_source(writer, name, url, file_hash, chunks, prev):
+    """
+    Queues the chunks of one changed source and returns (manifest entry,
+    stale ids, {doc_type: stale partition ids}). A source whose doc_type
+    changed is rewritten in full so its chunks move to the new partition.
+    """
+    doc_type = reference_doc_type(name, chunks)
+    prev_ids = {c["id"] for c in prev["chunks"]} if prev else set()
+    retyped = bool(prev) and prev.get("doc_type") != doc_type
+    stem = Path(name).stem
+    entries = []
+    seen = set()
+    for i, chunk in enumerate(chunks):
+        chunk_hash = sha256_bytes(chunk.encode("utf-8"))
+        chunk_id = f"{stem}_{chunk_hash[:16]}"
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        entries.append({"id": chunk_id, "hash": chunk_hash, "chunk": i})
+        item = {
+            "id": chunk_id,
+            "text": chunk,
+            "meta": {"source": name, "url": url, "chunk": i, "doc_type": doc_type}
+        }
+        # Unchanged chunks keep their vectors; only their position may move.
+        if chunk_id in prev_ids and not retyped:
+            writer.relabel(item)
+        else:
+            writer.upsert(item)
+    stale = prev_ids - seen
+    if retyped:
+        partition_stale = {prev["doc_type"]: list(prev_ids)} if prev.get("doc_type") else {}
+    else:
+        partition_stale = {doc_type: list(stale)} if stale else {}
+    entry = {"url": url, "file_hash": file_hash, "doc_type": doc_type, "tagger": DOC_TYPE_TAGGER, "chunks": entries}
+    return entry, stale, partition_stale
 
 def ingest():
+    """
+    Incremental, idempotent, pipelined ingestion.
+
+    Downloads run on a thread pool sharing one pooled HTTP session, PDF/DOCX
+    extraction runs on a process pool, and chunks are streamed through
+    embedding into Chroma in UPSERT_BATCH_SIZE batches while later sources
+    are still downloading or extracting.
+
+    Chunk ids are derived from the chunk content, so a re-run only embeds
+    chunks whose text changed, upserts them, and deletes chunks that no longer
+    exist. Sources whose file hash is unchanged are skipped without
+    re-extraction, unless their doc_type tag is missing or out of date
+    (_tag_is_current). A missing manifest, or a manifest or collection recorded
+    with a different embedding backend, model or dimension, triggers a full
+    rebuild.
+
+    Each source is tagged with a doc_type (see reference_doc_type) that is
+    stored on its chunks, which are also written to that type's partition
+    collection (retriever.partition_name). The NumPy vector index and the
+    BM25 index are rebuilt from the final collection.
+    """
     links = extract_links_from_docx(DATA_SRC_DOCX)
     print(f"Found {len(links)} links in {DATA_SRC_DOCX.name}")
-    all_chunks = []
-    for url in tqdm(links, desc="Processing links"):
-        file_path = download_file(url)
-        if not file_path:
-            continue
-        text = extract_text(file_path)
-        if not text:
-            continue
-        for i, chunk in enumerate(chunk_text(text)):
-            all_chunks.append({
-                "id": f"{file_path.stem}_{i}",
-                "text": chunk,
-                "meta": {"source": file_path.name, "url": url}
-            })
-    if not all_chunks:
+
+    embedding = embedding_metadata()
+    manifest = load_manifest()
+    chroma_client = get_chroma_client()
+    rebuild = manifest is None or manifest.get("embed_model") != EMBED_MODEL_NAME or bool(
+        embedding_mismatches(manifest, embedding))
+    if not rebuild:
+        try:
+            rebuild = bool(embedding_mismatches(chroma_client.get_collection(COLLECTION_NAME).metadata, embedding))
+        except Exception:
+            pass
+    prev_sources = {} if rebuild else manifest.get("sources", {})
+
+    if rebuild:
+        print(f"No manifest or collection for the current embedder ({EMBED_MODEL_NAME}); rebuilding the collection.")
+        partitions = [getattr(c, "name", c) for c in chroma_client.list_collections()]
+        for name in [COLLECTION_NAME] + [n for n in partitions if n.startswith(COLLECTION_NAME + "__")]:
+            try:
+                chroma_client.delete_collection(name)
+            except Exception:
+                pass
+    col = chroma_client.get_or_create_collection(COLLECTION_NAME, metadata=embedding)
+    if not col.metadata:
+        # Collections created before the embedder was recorded.
+        col.modify(metadata=embedding)
+    writer = _ChunkWriter(col, chroma_client, metadata=embedding)
+
+    sources = {}
+    to_delete = []
+    partition_deletes = {}
+    unchanged = 0
+    progress = tqdm(total=len(links), desc="Processing links")
+
+    # "spawn" keeps extraction workers from forking a parent that may already
+    # hold the embedding model and its thread pools.
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=mp_context) as extract_pool:
+        extracting = {}
+        downloads = download_all(links)
+
+        def handle_extracted(done):
+            for fut in done:
+                name, url, file_hash, prev = extracting.pop(fut)
+                try:
+                    chunks = fut.result()
+                except Exception as e:
+                    print(f"Extraction failed for {name}: {e}")
+                    chunks = []
+                if chunks:
+                    sources[name], stale, partition_stale = _index_source(writer, name, url, file_hash, chunks, prev)
+                    to_delete.extend(stale)
+                    for doc_type, ids in partition_stale.items():
+                        partition_deletes.setdefault(doc_type, []).extend(ids)
+                progress.update(1)
+
+        for url, file_path in downloads:
+            if not file_path:
+                # Keep what is already indexed rather than treating it as removed.
+                name = Path(url.split("?")[0]).name
+                if name in prev_sources:
+                    sources[name] = prev_sources[name]
+                progress.update(1)
+                continue
+            prev = prev_sources.get(file_path.name)
+            file_hash = sha256_file(file_path)
+            if prev and prev["file_hash"] == file_hash and prev["url"] == url and _tag_is_current(prev, file_path.name):
+                sources[file_path.name] = prev
+                unchanged += 1
+                progress.update(1)
+                continue
+            fut = extract_pool.submit(extract_chunks, str(file_path))
+            extracting[fut] = (file_path.name, url, file_hash, prev)
+            # Stream finished extractions into the writer while downloads continue.
+            handle_extracted([f for f in list(extracting) if f.done()])
+
+        while extracting:
+            done, _ = wait(list(extracting), return_when=FIRST_COMPLETED)
+            handle_extracted(done)
+
+    progress.close()
+    writer.flush()
+
+    for name, prev in prev_sources.items():
+        if name not in sources:
+            ids = [c["id"] for c in prev["chunks"]]
+            to_delete.extend(ids)
+            if prev.get("doc_type"):
+                partition_deletes.setdefault(prev["doc_type"], []).extend(ids)
+    writer.delete(to_delete, partition_deletes)
+
+    save_manifest(dict(embedding, sources=sources))
+    snapshot = export_collection(col, EMBED_MODEL_NAME, embed_backend=EMBED_BACKEND)
+    build_bm25_index(snapshot["ids"], snapshot.get("documents") or [], snapshot.get("metadatas") or [])
+
+    if not sources:
         print("No content to index.")
         return
-
-    try:
-        col = chroma_client.get_collection("adgm_docs")
-    except Exception:
-        col = chroma_client.create_collection("adgm_docs")
-
-    col.add(
-        ids=[c["id"] for c in all_chunks],
-        embeddings=embed_texts([c["text"] for c in all_chunks]),
-        metadatas=[c["meta"] for c in all_chunks],
-        documents=[c["text"] for c in all_chunks]
+    print(
+        f"Ingestion complete. {unchanged} sources unchanged, {writer.embedded} chunks embedded, "
+        f"{writer.kept} chunks kept, {len(to_delete)} stale chunks deleted."
     )
-    print(f"Ingestion complete. {len(all_chunks)} chunks added to Chroma.")
+    stats = embedding_cache.stats()
+    print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses (hit rate {stats['hit_rate']:.1%}).")
 
 
 if __name__ == "__main__":
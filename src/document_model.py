@@ -0,0 +1,216 @@
+import io
+import re
+from bisect import bisect_right
+from pathlib import Path
+from typing import List, Optional
+
+import docx
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+from src.paragraph_index import ParagraphIndex
+from src.pdf_extract import extract_pdf_pages
+
+# Short lines that look like clause/article headings even without a heading style.
+_HEADING_RE = re.compile(
+    r"^(?:(?i:article|clause|section|part|schedule)\s+[\dIVXLCivxlc]+\b.*"
+    r"|\d+(?:\.\d+)*\.?\s+[A-Z].*"
+    r"|[A-Z][A-Z0-9 ,&'()\-]{3,})$"
+)
+_MAX_HEADING_WORDS = 12
+
+
+class ParagraphSpan:
+    """One paragraph of a document and its position in DocumentModel.text."""
+
+    __slots__ = ("index", "text", "start", "end", "style", "is_heading", "heading", "runs", "paragraph")
+
+    def __init__(self, index, text, start, style=None, is_heading=False, heading=None, runs=None, paragraph=None):
+        self.index = index
+        self.text = text
+        self.start = start
+        self.end = start + len(text)
+        self.style = style
+        self.is_heading = is_heading
+        # Text of the nearest heading at or above this paragraph.
+        self.heading = heading
+        # (start, end) offsets in DocumentModel.text of each direct run.
+        self.runs = runs or []
+        # The underlying python-docx Paragraph, when the source is a .docx.
+        self.paragraph = paragraph
+
+
+class DocumentModel:
+    """
+    In-memory representation of an uploaded document, built once from the
+    upload bytes and shared by every pipeline stage.
+
+    text is the paragraphs joined with "\\n", so every paragraph occupies
+    [span.start, span.end) in it. Classification, retrieval and LLM prompting
+    read text; annotation resolves issues to paragraphs by character offset
+    and edits the parsed python-docx document directly, with no second parse
+    and no temp file. page_starts holds the offset in text at which each page
+    begins, for sources with pages (PDF).
+    """
+
+    def __init__(self, filename: str, paragraphs: List[ParagraphSpan], source_bytes: bytes = b"", docx_document=None,
+                 kind: str = "docx", page_starts: Optional[List[int]] = None):
+        self.filename = filename
+        self.kind = kind
+        self.page_starts = page_starts or []
+        self.paragraphs = paragraphs
+        self.source_bytes = source_bytes
+        self.docx = docx_document
+        self.text = "\n".join(p.text for p in paragraphs)
+        self._starts = [p.start for p in paragraphs]
+        self._index = None
+
+    @property
+    def sections(self) -> List[ParagraphSpan]:
+        return [p for p in self.paragraphs if p.is_heading]
+
+    @property
+    def index(self) -> ParagraphIndex:
+        if self._index is None:
+            self._index = ParagraphIndex([p.text for p in self.paragraphs])
+        return self._index
+
+    def paragraph_at(self, offset: int) -> Optional[ParagraphSpan]:
+        if offset is None or offset < 0 or not self.paragraphs:
+            return None
+        return self.paragraphs[bisect_right(self._starts, offset) - 1]
+
+    def locate(self, problematic_text: Optional[str], section_text: Optional[str] = None) -> Optional[int]:
+        """
+        Character offset in text for an issue: the start of problematic_text
+        when it is found verbatim (or case-insensitively), otherwise the start
+        of the best-matching paragraph. None if nothing matches.
+        """
+        hit = self.index.locate(problematic_text, section_text)
+        if hit is None:
+            return None
+        i, local = hit
+        return self.paragraphs[i].start + (local or 0)
+
+    def ensure_docx(self):
+        """
+        Returns the python-docx document to annotate. Sources that are not
+        .docx (e.g. PDF) get a new document with one paragraph per span.
+        """
+        if self.docx is None:
+            document = docx.Document()
+            for span in self.paragraphs:
+                span.paragraph = document.add_paragraph(span.text)
+            self.docx = document
+        return self.docx
+
+    def save(self, path: Path):
+        self.ensure_docx().save(str(path))
+
+
+def is_heading_line(text: str) -> bool:
+    """True for short lines that look like clause/article headings."""
+    stripped = text.strip()
+    return bool(stripped) and len(stripped.split()) <= _MAX_HEADING_WORDS and bool(_HEADING_RE.match(stripped))
+
+
+def _is_heading(style: Optional[str], text: str) -> bool:
+    style = style or ""
+    if style.startswith("Heading") or style == "Title":
+        return True
+    return is_heading_line(text)
+
+
+def _iter_paragraphs(parent, container):
+    """Yields body paragraphs in document order, descending into table cells."""
+    for child in container.iterchildren():
+        if child.tag == qn("w:p"):
+            yield Paragraph(child, parent)
+        elif child.tag == qn("w:tbl"):
+            table = Table(child, parent)
+            seen = set()
+            for row in table.rows:
+                for cell in row.cells:
+                    # Horizontally merged cells are returned once per grid column.
+                    if id(cell._tc) in seen:
+                        continue
+                    seen.add(id(cell._tc))
+                    yield from _iter_paragraphs(cell, cell._tc)
+
+
+def load_docx(filename: str, data: bytes) -> DocumentModel:
+    document = docx.Document(io.BytesIO(data))
+    spans = []
+    pos = 0
+    heading = None
+    for i, paragraph in enumerate(_iter_paragraphs(document, document.element.body)):
+        text = paragraph.text
+        style = paragraph.style.name if paragraph.style is not None else None
+        is_heading = _is_heading(style, text)
+        if is_heading:
+            heading = text.strip()
+        runs = []
+        run_pos = pos
+        for run in paragraph.runs:
+            runs.append((run_pos, run_pos + len(run.text)))
+            run_pos += len(run.text)
+        spans.append(ParagraphSpan(
+            i, text, pos,
+            style=style, is_heading=is_heading, heading=heading, runs=runs, paragraph=paragraph,
+        ))
+        pos += len(text) + 1
+    return DocumentModel(filename, spans, source_bytes=data, docx_document=document)
+
+
+def _pdf_paragraphs(lines):
+    """
+    Re-flows extracted PDF lines into paragraphs: a line ends its paragraph
+    when it finishes a sentence, and heading-like lines stand alone.
+    """
+    current = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if current:
+                yield " ".join(current)
+                current = []
+            continue
+        if _is_heading(None, line):
+            if current:
+                yield " ".join(current)
+                current = []
+            yield line
+            continue
+        current.append(line)
+        if line.endswith((".", ":", ";")):
+            yield " ".join(current)
+            current = []
+    if current:
+        yield " ".join(current)
+
+
+def load_pdf(filename: str, data: bytes) -> DocumentModel:
+    """Builds a DocumentModel from PDF bytes, consuming pages as they are extracted."""
+    spans = []
+    pos = 0
+    heading = None
+    page_starts = []
+    for page_text in extract_pdf_pages(data):
+        page_starts.append(pos)
+        for text in _pdf_paragraphs(page_text.splitlines()):
+            is_heading = _is_heading(None, text)
+            if is_heading:
+                heading = text
+            spans.append(ParagraphSpan(len(spans), text, pos, is_heading=is_heading, heading=heading))
+            pos += len(text) + 1
+    return DocumentModel(filename, spans, source_bytes=data, kind="pdf", page_starts=page_starts)
+
+
+def load_document(filename: str, data: bytes) -> DocumentModel:
+    ext = Path(filename).suffix.lower()
+    if ext == ".docx":
+        return load_docx(filename, data)
+    if ext == ".pdf":
+        return load_pdf(filename, data)
+    raise ValueError(f"Unsupported file format: {ext}")
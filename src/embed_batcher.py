@@ -0,0 +1,123 @@
+"""
+Dynamic micro-batching of embedding requests.
+
+Concurrent reviews each embed a handful of texts: a classifier probe, or a
+few clause pieces for retrieval. Encoded one call at a time, that is many
+small forward passes. EmbeddingBatcher queues those calls and a single
+worker thread encodes them together. A batch is flushed as soon as it holds
+max_batch_size texts, or max_wait_seconds after its oldest request arrived.
+Each caller then gets back its own rows.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from src.metrics import EMBED_BATCH_SIZE, EMBED_QUEUE_WAIT_SECONDS
+
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "1") == "1"
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "64"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+
+
+class EmbeddingBatcher:
+    """
+    Wraps encode_fn(texts) -> matrix. Requests of max_batch_size texts or
+    more are encoded directly in the caller's thread. The worker thread is
+    started on first use, and started again in a forked child, so a
+    pre-fork server master never owns it.
+    """
+
+    def __init__(self, encode_fn, max_batch_size: int = EMBED_BATCH_MAX_SIZE,
+                 max_wait_seconds: float = EMBED_BATCH_MAX_WAIT_MS / 1000):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max_wait_seconds
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._queued = 0
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+
+    def encode(self, texts) -> np.ndarray:
+        texts = list(texts)
+        if not texts or len(texts) >= self.max_batch_size:
+            EMBED_BATCH_SIZE.observe(len(texts))
+            return np.asarray(self.encode_fn(texts))
+
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._pending.append((texts, future, time.perf_counter()))
+            self._queued += len(texts)
+            self._cond.notify()
+        return future.result()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        # A forked child inherits the queue but not the thread serving it.
+        self._pending = deque()
+        self._queued = 0
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def _next_batch(self) -> list:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0][2] + self.max_wait_seconds
+            while self._queued < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            size = 0
+            while self._pending and (not batch or size + len(self._pending[0][0]) <= self.max_batch_size):
+                item = self._pending.popleft()
+                batch.append(item)
+                size += len(item[0])
+            self._queued -= size
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            texts = [text for request, _, _ in batch for text in request]
+            for _, _, enqueued in batch:
+                EMBED_QUEUE_WAIT_SECONDS.observe(started - enqueued)
+            EMBED_BATCH_SIZE.observe(len(texts))
+            self.batches += 1
+            self.requests += len(batch)
+            self.texts += len(texts)
+            try:
+                vectors = np.asarray(self.encode_fn(texts))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            pos = 0
+            for request, future, _ in batch:
+                future.set_result(vectors[pos:pos + len(request)])
+                pos += len(request)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": EMBED_BATCHING,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "queue_depth": self._queued,
+        }
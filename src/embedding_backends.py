@@ -0,0 +1,219 @@
+"""
+Embedding backends, selected with EMBED_BACKEND:
+
+  sentence-transformers  all-MiniLM-L6-v2 (default). Needs torch, and the
+                         model weights are downloaded on first use.
+  ngram                  NgramEmbedder below: pure NumPy, no model files.
+  hash                   hashed bag of words (src/stub_backends.py), for load tests.
+
+A backend's name and dimension identify its vector space. They key the
+embedding cache and are recorded in the Chroma collection metadata, the NumPy
+index and the ingest manifest. Stored vectors from a different backend are
+rejected instead of being compared with the configured backend's queries.
+"""
+import hashlib
+import os
+import re
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+SENTENCE_TRANSFORMER_MODEL = "all-MiniLM-L6-v2"
+
+EMBED_NGRAM_DIM = int(os.getenv("EMBED_NGRAM_DIM", "384"))
+# Document frequencies fitted on the reference chunks (python -m src.embedding_backends).
+EMBED_NGRAM_IDF_PATH = Path(os.getenv("EMBED_NGRAM_IDF_PATH", "data_sources/ngram_idf.npy"))
+# Size of the sparse hashed feature space, and the dense coordinates each feature is projected onto.
+NGRAM_FEATURES = 1 << 18
+NGRAM_PROJECTION_NNZ = 4
+NGRAM_CHAR_SIZES = (3, 4, 5)
+# Weights of a word's character n-grams and of word bigrams, relative to a word.
+NGRAM_CHAR_WEIGHT = 1.0
+NGRAM_BIGRAM_WEIGHT = 0.5
+
+_WORD = re.compile(r"\w+")
+
+
+class EmbeddingBackend:
+    """Interface for embedders; encode() takes the arguments SentenceTransformer.encode() does."""
+
+    backend = "base"
+    name = "base"
+    dim = 0
+
+    def encode(self, texts, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    backend = "sentence-transformers"
+
+    def __init__(self, model_name: str = SENTENCE_TRANSFORMER_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        return self.model.encode(texts, show_progress_bar=show_progress_bar, **kwargs)
+
+
+def _feature(kind: str, token: str) -> int:
+    return zlib.crc32(f"{kind}:{token}".encode("utf-8")) & (NGRAM_FEATURES - 1)
+
+
+@lru_cache(maxsize=100_000)
+def _word_features(word: str) -> tuple:
+    """(feature ids, weights) of a word: the word itself and its character n-grams."""
+    ids = [_feature("w", word)]
+    padded = f"<{word}>"
+    for n in NGRAM_CHAR_SIZES:
+        ids.extend(_feature("c", padded[i:i + n]) for i in range(len(padded) - n + 1))
+    return tuple(ids), (1.0,) + (NGRAM_CHAR_WEIGHT,) * (len(ids) - 1)
+
+
+def _idf_fingerprint(path: Path):
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()[:8]
+    except FileNotFoundError:
+        return None
+
+
+def ngram_model_name(dim: int = EMBED_NGRAM_DIM, idf_path: Path = EMBED_NGRAM_IDF_PATH) -> str:
+    """Name of the n-gram embedder's vector space, which changes with its dimension and IDF table."""
+    fingerprint = _idf_fingerprint(Path(idf_path))
+    return f"hashed-ngram-{dim}" + (f"-idf-{fingerprint}" if fingerprint else "")
+
+
+class NgramEmbedder(EmbeddingBackend):
+    """
+    Hashed n-gram TF-IDF embedder. A text's words, word bigrams and character
+    3-5-grams are hashed into NGRAM_FEATURES sparse features. Each is weighted
+    by 1 + log(count), by its kind's weight and, once a table has been fitted,
+    by IDF. Character n-grams match inflections ("director", "directors")
+    that whole words miss. A fixed sparse random projection
+    (NGRAM_PROJECTION_NNZ signed coordinates per feature) maps the features
+    to dim dense dimensions, and the result is L2-normalised.
+    """
+
+    backend = "ngram"
+
+    def __init__(self, dim: int = EMBED_NGRAM_DIM, idf_path: Path = EMBED_NGRAM_IDF_PATH, seed: int = 0):
+        self.dim = dim
+        self.name = ngram_model_name(dim, idf_path)
+        self.idf = np.load(idf_path) if Path(idf_path).exists() else None
+        rng = np.random.default_rng(seed)
+        self._coords = rng.integers(0, dim, size=(NGRAM_FEATURES, NGRAM_PROJECTION_NNZ), dtype=np.int32)
+        self._signs = (rng.choice([-1.0, 1.0], size=(NGRAM_FEATURES, NGRAM_PROJECTION_NNZ))
+                       / np.sqrt(NGRAM_PROJECTION_NNZ)).astype(np.float32)
+
+    def features(self, text: str):
+        """(unique feature ids, weights before IDF) of one text."""
+        words = _WORD.findall(text.lower())
+        ids = []
+        weights = []
+        for word in words:
+            word_ids, word_weights = _word_features(word)
+            ids.extend(word_ids)
+            weights.extend(word_weights)
+        ids.extend(_feature("b", f"{a} {b}") for a, b in zip(words, words[1:]))
+        weights.extend([NGRAM_BIGRAM_WEIGHT] * max(0, len(words) - 1))
+        if not ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        unique, inverse = np.unique(np.asarray(ids, dtype=np.int64), return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(unique))
+        kind_weights = np.zeros(len(unique))
+        kind_weights[inverse] = weights
+        return unique, ((1.0 + np.log(counts)) * kind_weights).astype(np.float32)
+
+    def encode(self, texts, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        rows, ids, weights = [], [], []
+        for row, text in enumerate(texts):
+            text_ids, tf = self.features(text)
+            rows.append(np.full(len(text_ids), row, dtype=np.int64))
+            ids.append(text_ids)
+            weights.append(tf if self.idf is None else tf * self.idf[text_ids])
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if not texts or not any(len(i) for i in ids):
+            return out
+        rows, ids, weights = np.concatenate(rows), np.concatenate(ids), np.concatenate(weights)
+        # Each sparse feature adds its weight, with a fixed sign, to NGRAM_PROJECTION_NNZ dense coordinates.
+        cells = (rows[:, None] * self.dim + self._coords[ids]).ravel()
+        values = (weights[:, None] * self._signs[ids]).ravel()
+        out = np.bincount(cells, weights=values, minlength=len(texts) * self.dim)
+        out = out.reshape(len(texts), self.dim).astype(np.float32)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+    def fit_idf(self, documents) -> np.ndarray:
+        """Smoothed IDF of every hashed feature over documents."""
+        df = np.zeros(NGRAM_FEATURES, dtype=np.float64)
+        n = 0
+        for text in documents:
+            df[self.features(text)[0]] += 1
+            n += 1
+        return (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+
+
+def make_embed_backend(backend: str) -> EmbeddingBackend:
+    if backend == "sentence-transformers":
+        return SentenceTransformerBackend()
+    if backend == "ngram":
+        return NgramEmbedder()
+    if backend == "hash":
+        from src.stub_backends import HashEmbedder
+        return HashEmbedder()
+    raise ValueError(f"Unknown EMBED_BACKEND {backend!r}; use sentence-transformers, ngram or hash.")
+
+
+def describe_backend(backend: str) -> dict:
+    """
+    The metadata recorded with a backend's vectors, without loading the
+    backend. embed_dim is None for sentence-transformers, whose dimension is
+    only known once the model is loaded (it follows from the model name).
+    """
+    if backend == "sentence-transformers":
+        name, dim = SENTENCE_TRANSFORMER_MODEL, None
+    elif backend == "ngram":
+        name, dim = ngram_model_name(), EMBED_NGRAM_DIM
+    elif backend == "hash":
+        from src.stub_backends import hash_model_name, STUB_EMBED_DIM
+        name, dim = hash_model_name(STUB_EMBED_DIM), STUB_EMBED_DIM
+    else:
+        raise ValueError(f"Unknown EMBED_BACKEND {backend!r}; use sentence-transformers, ngram or hash.")
+    return {"embed_backend": backend, "embed_model": name, "embed_dim": dim}
+
+
+def embedding_mismatches(recorded: dict, expected: dict) -> list:
+    """Keys whose recorded value differs from the expected one; keys missing on either side are not compared."""
+    recorded = recorded or {}
+    return [k for k, v in expected.items()
+            if v is not None and recorded.get(k) is not None and recorded[k] != v]
+
+
+def check_embedding_metadata(recorded: dict, expected: dict, what: str):
+    """Raises ValueError when vectors described by recorded were not made by the expected backend."""
+    mismatched = embedding_mismatches(recorded, expected)
+    if mismatched:
+        found = ", ".join(f"{k}={recorded[k]}" for k in mismatched)
+        wanted = ", ".join(f"{k}={expected[k]}" for k in mismatched)
+        raise ValueError(f"{what} was built with {found}, but the configured embedder has {wanted}; re-run ingestion.")
+
+
+if __name__ == "__main__":
+    # Fits the n-gram embedder's IDF table on the reference chunks of the exported vector index.
+    # Its name changes with the table, so the next ingestion re-embeds the corpus with it.
+    from src.vector_index import VectorIndex
+
+    documents = VectorIndex().documents
+    idf = NgramEmbedder().fit_idf(documents)
+    EMBED_NGRAM_IDF_PATH.parent.mkdir(parents=True, exist_ok=True)
+    np.save(EMBED_NGRAM_IDF_PATH, idf)
+    print(f"Wrote IDF of {len(documents)} reference chunks to {EMBED_NGRAM_IDF_PATH} "
+          f"({ngram_model_name()}); re-run ingestion to re-embed the corpus.")
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single server process, no cross-process locking.
+    fcntl = None
+
+EMBED_CACHE_DIR = Path(os.getenv("EMBED_CACHE_DIR", "data_sources/embedding_cache"))
+EMBED_CACHE_DISABLED = os.getenv("EMBED_CACHE_DISABLED", "0") == "1"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache for a single embedding model.
+
+    Vectors are appended to a raw float32 file (vectors.f32) that is read back
+    through a numpy memmap; index.sqlite3 maps the SHA-256 of each text to its
+    row in that matrix. Only texts that miss the cache are sent to the encoder,
+    in one batch.
+
+    Several server processes may share one cache: appends are serialised by
+    a file lock and take their row numbers from the size of vectors.f32, and
+    keys unknown to this process are looked up in the index before encoding.
+    """
+
+    def __init__(self, model_name: str, root: Path = EMBED_CACHE_DIR):
+        self.model_name = model_name
+        self.dir = Path(root) / re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.hits = 0
+        self.misses = 0
+        self.dim = None
+        self._rows = {}
+        self._matrix = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._conn is not None:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.dir / "index.sqlite3"), check_same_thread=False)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS idx (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        conn.commit()
+        row = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if row:
+            self.dim = int(row[0])
+            # Rows whose vectors never reached disk (e.g. after a crash) are dropped.
+            on_disk = self._vectors_path().stat().st_size // (4 * self.dim) if self._vectors_path().exists() else 0
+            conn.execute("DELETE FROM idx WHERE row >= ?", (on_disk,))
+            conn.commit()
+            self._rows = dict(conn.execute("SELECT key, row FROM idx"))
+        self._conn = conn
+
+    def _vectors_path(self) -> Path:
+        return self.dir / "vectors.f32"
+
+    def _rows_on_disk(self) -> int:
+        path = self._vectors_path()
+        return path.stat().st_size // (4 * self.dim) if self.dim and path.exists() else 0
+
+    def _load_matrix(self, rows_needed: int):
+        if self._matrix is None or self._matrix.shape[0] < rows_needed:
+            self._matrix = np.memmap(self._vectors_path(), dtype=np.float32, mode="r",
+                                     shape=(self._rows_on_disk(), self.dim))
+        return self._matrix
+
+    def _refresh(self, keys):
+        """Picks up rows that other processes have added for keys."""
+        if self.dim is None:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+            if row is None:
+                return
+            self.dim = int(row[0])
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            self._rows.update(self._conn.execute(f"SELECT key, row FROM idx WHERE key IN ({placeholders})", batch))
+
+    @contextmanager
+    def _append_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.dir / "append.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get_or_compute(self, texts, encode_fn) -> np.ndarray:
+        """
+        Returns a float32 matrix with one row per text. encode_fn is called at
+        most once, with the distinct texts that are not cached yet.
+        """
+        keys = [text_hash(t) for t in texts]
+        with self._lock:
+            self._open()
+            unknown = [k for k in dict.fromkeys(keys) if k not in self._rows]
+            if unknown:
+                self._refresh(unknown)
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key in self._rows:
+                    self.hits += 1
+                elif key not in missing:
+                    missing[key] = text
+                    self.misses += 1
+                else:
+                    self.hits += 1
+
+        # Encode outside the lock so concurrent callers are not serialised
+        # behind one another's forward passes.
+        if missing:
+            encoded = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+
+        with self._lock:
+            if missing:
+                missing_keys = list(missing)
+                fresh = [i for i, k in enumerate(missing_keys) if k not in self._rows]
+                if fresh:
+                    self._append([missing_keys[i] for i in fresh], encoded[fresh])
+            if not keys:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            rows = [self._rows[k] for k in keys]
+            matrix = self._load_matrix(max(rows) + 1)
+            return np.array(matrix[rows])
+
+    def _append(self, keys, vectors: np.ndarray):
+        with self._append_lock():
+            if self.dim is None:
+                self._refresh([])
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (str(self.dim),))
+            start = self._rows_on_disk()
+            with open(self._vectors_path(), "ab") as f:
+                # Cut off a partial row left by a crashed writer, so the new rows start at row `start`.
+                f.truncate(start * 4 * self.dim)
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            new_rows = [(k, start + i) for i, k in enumerate(keys)]
+            self._conn.executemany("INSERT OR REPLACE INTO idx (key, row) VALUES (?, ?)", new_rows)
+            self._conn.commit()
+        self._rows.update(new_rows)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "disabled": EMBED_CACHE_DISABLED,
+        }
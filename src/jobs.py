@@ -0,0 +1,191 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from src.pipeline import OUTPUT_DIR, REPORT_TIMING_BREAKDOWN, review_file, build_report, write_report
+
+JOBS_DIR = OUTPUT_DIR / "jobs"
+JOBS_DIR.mkdir(parents=True, exist_ok=True)
+# Number of review jobs processed at once; files inside a job are further
+# spread over the shared review executor.
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "2")))
+# Finished jobs are dropped from memory after JOB_TTL_SECONDS, or oldest first
+# once more than JOB_MAX_IN_MEMORY are held; they stay readable from disk.
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+JOB_MAX_IN_MEMORY = max(1, int(os.getenv("JOB_MAX_IN_MEMORY", "100")))
+# Progress and issue events are written to disk at most this often per job;
+# status changes are always written at once.
+JOB_SAVE_INTERVAL_SECONDS = float(os.getenv("JOB_SAVE_INTERVAL_SECONDS", "1.0"))
+
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+
+
+def _process_alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Job:
+    def __init__(self, job_id: str, files: List[str]):
+        self.id = job_id
+        self.files = files
+        self.status = QUEUED
+        self.events = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        # Server process running the job; other workers read its progress from disk.
+        self.pid = os.getpid()
+        self.saved_at = 0.0
+        # Guards status, result, error and events; re-entrant so to_dict() can run under it.
+        self.lock = threading.RLock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "files": self.files,
+                "events": list(self.events),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+                "pid": self.pid,
+            }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Job":
+        job = cls(data["job_id"], data["files"])
+        job.status = data["status"]
+        job.events = data["events"]
+        job.result = data["result"]
+        job.error = data["error"]
+        job.created_at = data["created_at"]
+        job.updated_at = data["updated_at"]
+        job.pid = data.get("pid")
+        return job
+
+
+class JobManager:
+    """
+    Runs review jobs in the background and records their progress.
+
+    Every job is persisted to outputs/jobs/<id>.json at each status change,
+    and at most every JOB_SAVE_INTERVAL_SECONDS for progress and issue
+    events, so status, the event log and the final report survive a client
+    disconnect, can be read by the other workers of a multi-process server
+    and can be re-read after a server restart. Events and saves take the
+    job's own lock, so concurrent jobs do not wait on each other's writes.
+    Finished jobs are evicted from memory (see JOB_TTL_SECONDS) and are then
+    served from disk.
+    """
+
+    def __init__(self, review_executor: Executor, concurrency: int, workers: int = JOB_WORKERS):
+        self.review_executor = review_executor
+        self.concurrency = concurrency
+        self._runner = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _path(self, job_id: str):
+        return JOBS_DIR / f"{job_id}.json"
+
+    def _save(self, job: Job):
+        job.updated_at = job.saved_at = time.time()
+        tmp_path = self._path(job.id).with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False)
+        tmp_path.replace(self._path(job.id))
+
+    def _event(self, job: Job, **event):
+        with job.lock:
+            event["seq"] = len(job.events)
+            event["time"] = time.time()
+            job.events.append(event)
+            if event["type"] == "status" or event["time"] - job.saved_at >= JOB_SAVE_INTERVAL_SECONDS:
+                self._save(job)
+
+    def _set_status(self, job: Job, status: str, **fields):
+        """Sets status (and result or error) and records the change in one step under the job's lock."""
+        with job.lock:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.status = status
+            self._event(job, type="status", status=status)
+
+    def _evict(self):
+        """Drops finished jobs older than JOB_TTL_SECONDS, then the oldest finished ones over JOB_MAX_IN_MEMORY."""
+        cutoff = time.time() - JOB_TTL_SECONDS
+        with self._lock:
+            finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.updated_at)
+            excess = len(self._jobs) - JOB_MAX_IN_MEMORY
+            for i, job in enumerate(finished):
+                if job.updated_at < cutoff or i < excess:
+                    del self._jobs[job.id]
+
+    def submit(self, uploads: List[Tuple[str, bytes]], breakdown: bool = REPORT_TIMING_BREAKDOWN) -> Job:
+        self._evict()
+        job = Job(uuid.uuid4().hex, [name for name, _ in uploads])
+        with self._lock:
+            self._jobs[job.id] = job
+        self._event(job, type="status", status=QUEUED)
+        self._runner.submit(self._run, job, uploads, breakdown)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        path = self._path(job_id)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            job = Job.from_dict(json.load(f))
+        if not job.finished and not _process_alive(job.pid):
+            # Persisted as in-flight by a process that is no longer running it.
+            job.status = FAILED
+            job.error = "Job was interrupted by a server restart."
+        return job
+
+    def _run(self, job: Job, uploads: List[Tuple[str, bytes]], breakdown: bool = REPORT_TIMING_BREAKDOWN):
+        started = time.perf_counter()
+        self._set_status(job, RUNNING)
+
+        def progress(filename, stage):
+            self._event(job, type="progress", file=filename, stage=stage)
+
+        def issue(filename, found):
+            self._event(job, type="issue", file=filename, issue=dict(found))
+
+        try:
+            futures = [
+                self.review_executor.submit(review_file, filename, data, progress, issue)
+                for filename, data in uploads
+            ]
+            results = [fut.result() for fut in futures]
+            result = build_report(results, time.perf_counter() - started, self.concurrency, breakdown=breakdown)
+            write_report(result, job.id)
+        except Exception as e:
+            print(f"[jobs] Job {job.id} failed: {e}")
+            self._set_status(job, FAILED, error=str(e))
+        else:
+            self._set_status(job, COMPLETED, result=result)
+        self._evict()
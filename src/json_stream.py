@@ -0,0 +1,127 @@
+"""
+Tolerant, incremental extraction of issue objects from LLM output.
+
+The model is asked for {"issues_found": [{...}, ...]}, but responses arrive in
+pieces when streamed and are not always valid JSON: code fences, prose around
+the object, trailing commas or a response cut off mid-way. IssueStreamParser
+tracks string and brace state across feed() calls. Every JSON object that
+closes is parsed on its own. Objects that look like issues are returned as
+soon as their closing brace arrives. A malformed object is skipped instead of
+failing the whole response.
+
+An unescaped quote inside a value flips the string state, after which every
+later brace is misread. The parser resynchronises at the next array element
+boundary ("}, {"), which cannot occur inside a well-formed issue: the broken
+object is skipped and scanning restarts at the following "{". close() counts
+an object left open at the end of the response as skipped.
+"""
+import json
+import re
+
+# Keys of which at least one marks a parsed object as an issue (and not, for
+# example, the {"issues_found": [...]} wrapper).
+ISSUE_KEYS = ("issue", "problematic_text", "section")
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+# An open object whose first value is an array: the {"issues_found": [...]} wrapper.
+_WRAPPER_START = re.compile(r'\{\s*"[^"]*"\s*:\s*\[')
+
+
+def _load_object(text: str):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        # Trailing commas and raw newlines inside strings are the common slips.
+        return json.loads(_TRAILING_COMMA.sub(r"\1", text), strict=False)
+    except json.JSONDecodeError:
+        return None
+
+
+class IssueStreamParser:
+    def __init__(self):
+        self._buffer = []
+        self._pos = 0
+        self._starts = []
+        self._in_string = False
+        self._escaped = False
+        self.skipped = 0
+
+    def feed(self, text: str) -> list:
+        """Consumes the next piece of output; returns the issue dicts completed by it."""
+        issues = []
+        for ch in text:
+            self._buffer.append(ch)
+            pos = self._pos
+            self._pos += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                elif ch == "{" and self._starts and self._at_element_boundary():
+                    self._resync(pos)
+            elif ch == '"':
+                self._in_string = self._starts != []
+            elif ch == "{":
+                self._starts.append(pos)
+            elif ch == "}" and self._starts:
+                start = self._starts.pop()
+                obj_text = "".join(self._buffer[start:pos + 1])
+                obj = _load_object(obj_text)
+                if isinstance(obj, dict) and any(k in obj for k in ISSUE_KEYS):
+                    issues.append(obj)
+                elif obj is None and not _WRAPPER_START.match(obj_text):
+                    # A wrapper that fails only repeats the failures of the issues inside it.
+                    self.skipped += 1
+                if not self._starts:
+                    # Nothing before a closed top-level object is needed again.
+                    self._buffer = []
+                    self._pos = 0
+        return issues
+
+    def _at_element_boundary(self) -> bool:
+        """Whether the "{" just appended follows "}" and "," (whitespace aside)."""
+        expected = [",", "}"]
+        for ch in reversed(self._buffer[:-1]):
+            if ch.isspace():
+                continue
+            if ch != expected.pop(0):
+                return False
+            if not expected:
+                return True
+        return False
+
+    def _resync(self, pos: int):
+        """Skips the object broken by a stray quote and restarts at the "{" at pos."""
+        self._starts.pop()
+        self.skipped += 1
+        self._in_string = False
+        self._escaped = False
+        if not self._starts:
+            # Nothing before the new object is needed again.
+            self._buffer = ["{"]
+            self._pos = 1
+            pos = 0
+        self._starts.append(pos)
+
+    def close(self) -> int:
+        """Ends the response; an issue object still open is counted as skipped. Returns skipped."""
+        if self._starts:
+            start = self._starts[-1]
+            if not _WRAPPER_START.match("".join(self._buffer[start:start + 200])):
+                self.skipped += 1
+        self._buffer, self._pos, self._starts = [], 0, []
+        self._in_string = self._escaped = False
+        return self.skipped
+
+
+def parse_issues(text: str) -> list:
+    """Every issue object that can be recovered from a complete response."""
+    parser = IssueStreamParser()
+    issues = parser.feed(text or "")
+    parser.close()
+    return issues
@@ -0,0 +1,269 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from src.llm_cache import make_cache_key
+
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1.0"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+
+# Provider exceptions worth retrying, matched by name so google.api_core does
+# not have to be imported to classify them.
+_TRANSIENT_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "GatewayTimeout", "Aborted",
+}
+_TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TransientLLMError(Exception):
+    """Raised by backends for failures that should be retried."""
+
+
+def is_transient(exc: Exception) -> bool:
+    if isinstance(exc, (TransientLLMError, ConnectionError, TimeoutError)):
+        return True
+    if type(exc).__name__ in _TRANSIENT_ERROR_NAMES:
+        return True
+    return getattr(exc, "code", None) in _TRANSIENT_STATUS_CODES
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for rate limiting."""
+    return max(1, len(text) // 4)
+
+
+class LLMBackend:
+    """Interface for text-generation providers used by LLMClient."""
+
+    name = "base"
+
+    def generate(self, prompt: str, model: str, temperature: float) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, model: str, temperature: float):
+        """Yields the response in pieces as the provider produces them; by default all at once."""
+        yield self.generate(prompt, model, temperature)
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google.generativeai, reusing one GenerativeModel per model name."""
+
+    name = "gemini"
+
+    def __init__(self, genai_factory):
+        self._genai_factory = genai_factory
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, model: str):
+        handle = self._models.get(model)
+        if handle is None:
+            with self._lock:
+                handle = self._models.get(model)
+                if handle is None:
+                    handle = self._models[model] = self._genai_factory().GenerativeModel(model)
+        return handle
+
+    def generate(self, prompt: str, model: str, temperature: float) -> str:
+        response = self._model(model).generate_content(prompt, generation_config={"temperature": temperature})
+        return response.text
+
+    def stream(self, prompt: str, model: str, temperature: float):
+        response = self._model(model).generate_content(
+            prompt, generation_config={"temperature": temperature}, stream=True
+        )
+        for chunk in response:
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until the requested amount is available."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0):
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class LLMClient:
+    """
+    Shared client in front of an LLMBackend.
+
+    - identical in-flight requests (same model, temperature and prompt) are
+      coalesced into a single backend call whose result every caller receives;
+    - calls are limited to max_concurrency at a time and by token buckets on
+      requests per minute and (estimated) prompt tokens per minute;
+    - transient failures are retried with full-jitter exponential backoff
+      (for stream(), only until the first piece has been received);
+    - queue depth, latency and retry/coalescing counters are kept for stats().
+    """
+
+    def __init__(self, backend: LLMBackend,
+                 requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_retries: int = LLM_MAX_RETRIES,
+                 retry_base_seconds: float = LLM_RETRY_BASE_SECONDS,
+                 retry_max_seconds: float = LLM_RETRY_MAX_SECONDS):
+        self.backend = backend
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._request_bucket = TokenBucket(requests_per_minute)
+        self._token_bucket = TokenBucket(tokens_per_minute)
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.waiting = 0
+        self.active = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.errors = 0
+
+    def generate(self, prompt: str, model: str, temperature: float) -> str:
+        key = make_cache_key(model, temperature, prompt, self.backend.name)
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            text = self._call_with_retry(prompt, model, temperature)
+            future.set_result(text)
+            return text
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _acquire(self, prompt: str):
+        with self._lock:
+            self.waiting += 1
+        try:
+            self._slots.acquire()
+            self._request_bucket.acquire(1)
+            self._token_bucket.acquire(estimate_tokens(prompt))
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                self.active += 1
+
+    def _release(self):
+        with self._lock:
+            self.active -= 1
+        self._slots.release()
+
+    def _retry_delay(self, e: Exception, attempt: int) -> float:
+        """Backoff before the next attempt; re-raises e when it should not be retried."""
+        if attempt >= self.max_retries or not is_transient(e):
+            with self._lock:
+                self.errors += 1
+            raise e
+        delay = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+        print(f"[llm_client] Transient error from {self.backend.name} ({e}); retry {attempt + 1} in {delay:.1f}s")
+        with self._lock:
+            self.retries += 1
+        return delay
+
+    def _call_with_retry(self, prompt: str, model: str, temperature: float) -> str:
+        attempt = 0
+        while True:
+            self._acquire(prompt)
+            started = time.perf_counter()
+            try:
+                text = self.backend.generate(prompt, model, temperature)
+                with self._lock:
+                    self.calls += 1
+                    self._latencies.append(time.perf_counter() - started)
+                return text
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+            finally:
+                self._release()
+            time.sleep(delay)
+            attempt += 1
+
+    def stream(self, prompt: str, model: str, temperature: float):
+        """
+        Yields the response in pieces. Streams are not coalesced; the
+        concurrency slot is held until the stream is exhausted or closed.
+        """
+        attempt = 0
+        while True:
+            self._acquire(prompt)
+            started = time.perf_counter()
+            received = False
+            try:
+                for piece in self.backend.stream(prompt, model, temperature):
+                    received = True
+                    yield piece
+                with self._lock:
+                    self.calls += 1
+                    self._latencies.append(time.perf_counter() - started)
+                return
+            except Exception as e:
+                if received:
+                    with self._lock:
+                        self.errors += 1
+                    raise
+                delay = self._retry_delay(e, attempt)
+            finally:
+                self._release()
+            time.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                "backend": self.backend.name,
+                "queue_depth": self.waiting,
+                "in_flight": self.active,
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "retries": self.retries,
+                "errors": self.errors,
+            }
+        if latencies:
+            stats["latency_seconds"] = {
+                "avg": round(sum(latencies) / len(latencies), 3),
+                "p50": round(latencies[len(latencies) // 2], 3),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+            }
+        return stats
@@ -0,0 +1,194 @@
+"""
+Timing spans and Prometheus metrics for the review pipeline.
+
+span(name) times a block, records it in the adgm_span_seconds histogram and,
+inside trace_spans(), appends it to the current request's span list so the
+report can carry a per-file timing breakdown. render() produces the
+Prometheus text exposition format served on GET /metrics.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+_trace = contextvars.ContextVar("adgm_trace", default=None)
+_registry = []
+_callbacks = []
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    labels = _format_labels(self.labels + ("le",), key + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labels + ("le",), key + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+def register_callback(name: str, help: str, kind: str, fn, **labels):
+    """
+    Registers a value read at scrape time (kind "gauge" or "counter"), for
+    state other modules already track, such as cache hit counters or the
+    LLM client's queue depth.
+    """
+    _callbacks.append((name, help, kind, tuple(labels.items()), fn))
+
+
+SPAN_SECONDS = Histogram("adgm_span_seconds", "Duration of review pipeline spans.", ("span",))
+LLM_PROMPT_TOKENS = Histogram(
+    "adgm_llm_prompt_tokens", "Estimated tokens per prompt sent to the LLM.",
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536),
+)
+REFERENCE_CONTEXT_TOKENS = Histogram(
+    "adgm_reference_context_tokens", "Estimated tokens of packed reference context per review.",
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+UPLOAD_PROMPT_TOKENS = Histogram(
+    "adgm_upload_prompt_tokens", "Estimated tokens of uploaded text per review, before and after prompt compression.",
+    ("stage",), buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536),
+)
+LLM_FIRST_CHUNK_SECONDS = Histogram(
+    "adgm_llm_first_chunk_seconds", "Time from sending a streamed LLM request to its first piece of output.",
+)
+FIRST_ISSUE_SECONDS = Histogram(
+    "adgm_first_issue_seconds", "Time from the start of red-flag detection to the first issue found, per document.",
+)
+EMBED_BATCH_SIZE = Histogram(
+    "adgm_embed_batch_size", "Texts per embedding model encode() call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+EMBED_QUEUE_WAIT_SECONDS = Histogram(
+    "adgm_embed_queue_wait_seconds", "Time an embedding request waited in the micro-batching queue.",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+ISSUES_PER_DOCUMENT = Histogram(
+    "adgm_issues_per_document", "Red-flag issues reported per reviewed document.",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34),
+)
+CACHE_REQUESTS = Counter("adgm_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+CLASSIFIER_TIERS = Counter(
+    "adgm_classifier_tier_total", "Documents classified, by the tier that answered (header, embedding, llm, none).",
+    ("tier",),
+)
+
+
+@contextmanager
+def span(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_SECONDS.observe(elapsed, span=name)
+        spans = _trace.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+@contextmanager
+def trace_spans():
+    """Collects the (name, seconds) of every span finished in this context."""
+    spans = []
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+def in_current_trace(fn):
+    """Wraps fn so that calls from worker threads record spans into the caller's trace."""
+    spans = _trace.get()
+
+    def run(*args, **kwargs):
+        token = _trace.set(spans)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _trace.reset(token)
+    return run
+
+
+def summarize_spans(spans) -> dict:
+    """Total seconds per span name, in first-seen order."""
+    totals = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return {name: round(seconds, 4) for name, seconds in totals.items()}
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    seen = set()
+    for name, help, kind, labels, fn in _callbacks:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+        names = tuple(k for k, _ in labels)
+        values = tuple(v for _, v in labels)
+        lines.append(f"{name}{_format_labels(names, values)} {fn()}")
+    return "\n".join(lines) + "\n"
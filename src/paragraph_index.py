@@ -0,0 +1,111 @@
+import re
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Paragraph texts are joined with a character that never occurs in document
+# text, so a substring match can never span two paragraphs.
+_SEP = "\x00"
+
+TOKEN_OVERLAP_THRESHOLD = 0.6
+
+
+def normalize_whitespace(s: str) -> str:
+    return " ".join(s.split()) if s is not None else ""
+
+
+class _Haystack:
+    """One view of the document (exact, lower-cased or whitespace-normalised) as a single string."""
+
+    def __init__(self, texts: List[str]):
+        self.text = _SEP.join(texts)
+        self.starts = []
+        pos = 0
+        for t in texts:
+            self.starts.append(pos)
+            pos += len(t) + 1
+        self._memo = {}
+
+    def find(self, needle: str) -> Optional[Tuple[int, int]]:
+        """(paragraph index, offset within that paragraph) of the first match, or None."""
+        if not needle:
+            return None
+        if needle not in self._memo:
+            pos = self.text.find(needle)
+            if pos == -1:
+                self._memo[needle] = None
+            else:
+                i = bisect_right(self.starts, pos) - 1
+                self._memo[needle] = (i, pos - self.starts[i])
+        return self._memo[needle]
+
+
+class ParagraphIndex:
+    """
+    Precomputed lookup structure for locating issues in a document.
+
+    Built once per document: holds the exact, lower-cased and whitespace-
+    normalised paragraph texts as three joined haystacks, plus per-paragraph
+    token sets and an inverted token -> paragraph map. Each lookup tier is then
+    a single C-level substring search (memoised per pattern) or a postings-list
+    merge, instead of a Python loop over every paragraph.
+
+    Tiers mirror the original heuristics and return the first matching
+    paragraph in document order:
+      1. exact substring match
+      2. case-insensitive match
+      3. normalized whitespace match
+      4. token overlap (>= 60% of the issue's tokens)
+      5. section_text matching (exact, case-insensitive, normalized)
+    """
+
+    def __init__(self, texts: List[str]):
+        texts = [t or "" for t in texts]
+        lower = [t.lower() for t in texts]
+        self.size = len(texts)
+        self.exact = _Haystack(texts)
+        self.lower = _Haystack(lower)
+        self.norm = _Haystack([normalize_whitespace(t) for t in lower])
+        self.postings = {}
+        for i, t in enumerate(lower):
+            for token in set(_TOKEN_RE.findall(t)):
+                self.postings.setdefault(token, []).append(i)
+
+    def _token_overlap(self, text: str) -> Optional[Tuple[int, None]]:
+        token_set = set(_TOKEN_RE.findall(text.lower()))
+        if not token_set:
+            return None
+        counts = {}
+        for token in token_set:
+            for i in self.postings.get(token, ()):
+                counts[i] = counts.get(i, 0) + 1
+        needed = TOKEN_OVERLAP_THRESHOLD * len(token_set)
+        hits = [i for i, c in counts.items() if c >= needed]
+        return (min(hits), None) if hits else None
+
+    def locate(self, problematic_text: Optional[str], section_text: Optional[str]) -> Optional[Tuple[int, Optional[int]]]:
+        """
+        Returns (paragraph index, offset of problematic_text within that
+        paragraph) for an issue, or None. The offset is None when the match
+        came from a tier that does not preserve character positions
+        (normalized whitespace, token overlap, section text).
+        """
+        if problematic_text and problematic_text.strip():
+            hit = self.exact.find(problematic_text) or self.lower.find(problematic_text.lower())
+            if hit is not None:
+                return hit
+            hit = (self.norm.find(normalize_whitespace(problematic_text).lower())
+                   or self._token_overlap(problematic_text))
+            if hit is not None:
+                return hit[0], None
+
+        if section_text:
+            st = section_text.strip()
+            hit = (self.exact.find(st)
+                   or self.lower.find(st.lower())
+                   or self.norm.find(normalize_whitespace(st).lower()))
+            if hit is not None:
+                return hit[0], None
+
+        return None
@@ -0,0 +1,108 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+import pdfplumber
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+PdfSource = Union[str, Path, bytes]
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _open(source: PdfSource):
+    if isinstance(source, (bytes, bytearray)):
+        return pdfplumber.open(io.BytesIO(source))
+    return pdfplumber.open(str(source))
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """The shared pool, recreated when a different number of workers is asked for."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        with _pool_lock:
+            if _pool is None or _pool_workers != workers:
+                if _pool is not None:
+                    # Tasks already submitted to the old pool still finish.
+                    _pool.shutdown(wait=False)
+                # "spawn" so workers never inherit a parent holding the
+                # embedding model or server threads.
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+                _pool_workers = workers
+    return _pool
+
+
+def page_count(source: PdfSource) -> int:
+    with _open(source) as pdf:
+        return len(pdf.pages)
+
+
+def iter_pdf_pages(source: PdfSource, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """Yields the text of pages [start, stop) one at a time."""
+    with _open(source) as pdf:
+        for page in pdf.pages[start:stop]:
+            yield page.extract_text() or ""
+            # pdfplumber caches parsed layout objects per page; drop them so
+            # memory stays flat across long documents.
+            page.flush_cache()
+
+
+def _extract_range(source: PdfSource, start: int, stop: int) -> List[str]:
+    """Process-pool entry point: text of pages [start, stop)."""
+    return list(iter_pdf_pages(source, start, stop))
+
+
+def extract_pdf_pages(source: PdfSource, workers: Optional[int] = None,
+                      pages_per_task: int = PDF_PAGES_PER_TASK) -> Iterator[str]:
+    """
+    Yields page texts in page order. With more than one worker and more than
+    one task's worth of pages, page ranges are extracted in parallel on a
+    shared process pool and yielded as soon as each range (and every range
+    before it) is done; otherwise pages are extracted serially, one at a time.
+    Uploaded bytes are written to a temporary file once for the pool, rather
+    than being pickled into every task.
+    """
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    if isinstance(source, Path):
+        source = str(source)
+    total = page_count(source)
+    if workers <= 1 or total <= pages_per_task:
+        yield from iter_pdf_pages(source)
+        return
+
+    tmp_path = None
+    if isinstance(source, (bytes, bytearray)):
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(source)
+        source = tmp_path = f.name
+    futures = []
+    try:
+        pool = _get_pool(workers)
+        futures = [
+            pool.submit(_extract_range, source, start, min(start + pages_per_task, total))
+            for start in range(0, total, pages_per_task)
+        ]
+        for fut in futures:
+            yield from fut.result()
+    finally:
+        if tmp_path is not None:
+            # A consumer that stops early leaves ranges that no longer need the file.
+            for fut in futures:
+                fut.cancel()
+            for fut in futures:
+                if not fut.cancelled():
+                    fut.exception()
+            os.unlink(tmp_path)
+
+
+def extract_pdf_text(source: PdfSource, workers: Optional[int] = None) -> str:
+    return "\n".join(extract_pdf_pages(source, workers=workers))
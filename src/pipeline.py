@@ -0,0 +1,178 @@
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from src.document_model import load_document
+from src.classifier import classify_document_with_tier
+from src.retriever import retrieve_reference, RETRIEVAL_TOP_K
+from src.red_flag_detector import (
+    detect_red_flags, locate_issues, annotate_document, prepare_uploaded_text, PROMPT_COMPRESSION,
+)
+from src.missing_docs_checker import check_missing_documents
+from src.metrics import span, trace_spans, summarize_spans, ISSUES_PER_DOCUMENT
+
+OUTPUT_DIR = Path("outputs")
+OUTPUT_DIR.mkdir(exist_ok=True)
+
+# Per-issue annotation logging; noisy, so off unless debugging.
+ANNOTATE_DEBUG = os.getenv("ANNOTATE_DEBUG", "0") == "1"
+# Include each file's per-span timing breakdown in the JSON report by default
+# (it can also be requested per call with ?breakdown=true).
+REPORT_TIMING_BREAKDOWN = os.getenv("REPORT_TIMING_BREAKDOWN", "0") == "1"
+
+
+STAGES = ("parse", "classify", "retrieve", "detect", "annotate")
+
+
+def reviewed_path(filename: str) -> Path:
+    """
+    Output path of a reviewed upload. The original extension and a random
+    suffix are part of the name, so a.docx and a.pdf in one upload, or the
+    same file in concurrent reviews, never overwrite each other.
+    """
+    name = Path(filename)
+    ext = name.suffix.lstrip(".").lower() or "file"
+    return OUTPUT_DIR / f"reviewed_{name.stem}_{ext}_{uuid.uuid4().hex[:8]}.docx"
+
+
+def review_file(filename: str, data: bytes, progress=None, on_issue=None) -> dict:
+    """
+    Runs the full review pipeline for a single uploaded file:
+    parse -> classify -> retrieve reference -> detect red flags -> annotate.
+    The upload is parsed once into a DocumentModel that every stage shares.
+    All stages are blocking, so callers running inside an event loop should
+    dispatch this to a worker pool.
+
+    progress, if given, is called as progress(filename, stage) when each
+    stage in STAGES starts and with stage "done" at the end. on_issue, if
+    given, is called as on_issue(filename, issue) for each red flag as soon
+    as it has been detected and located, before the document is annotated.
+    """
+    def report(stage):
+        if progress is not None:
+            progress(filename, stage)
+
+    first_issue = []
+
+    def issue_found(issue):
+        if not first_issue:
+            first_issue.append(round(time.perf_counter() - started, 3))
+        issue["document"] = filename
+        if issue.get("offset") is None:
+            issue["offset"] = document.locate(issue.get("problematic_text"), issue.get("section"))
+        if on_issue is not None:
+            on_issue(filename, issue)
+
+    started = time.perf_counter()
+    with trace_spans() as spans:
+        report("parse")
+        with span("parse"):
+            document = load_document(filename, data)
+        text = document.text
+
+        report("classify")
+        with span("classify"):
+            doc_type, classifier_tier = classify_document_with_tier(text)
+
+        report("retrieve")
+        with span("retrieve"):
+            ref_text, meta = retrieve_reference(text, doc_type=doc_type, top_k=RETRIEVAL_TOP_K)
+
+        report("detect")
+        with span("detect"):
+            prompt_text = prepare_uploaded_text(text, document.page_starts) if PROMPT_COMPRESSION else text
+            issues = detect_red_flags(prompt_text, ref_text, on_issue=issue_found)
+            locate_issues(document, issues)
+        ISSUES_PER_DOCUMENT.observe(len(issues))
+
+        report("annotate")
+        # Non-.docx uploads (PDF) are annotated into a new .docx of the extracted text.
+        commented_docx_path = reviewed_path(filename)
+        with span("annotate"):
+            try:
+                annotate_document(document, issues, commented_docx_path, debug=ANNOTATE_DEBUG)
+            except Exception as e:
+                print(f"[pipeline] Failed to add comments to {filename}: {e}")
+                if document.kind == "docx":
+                    commented_docx_path.write_bytes(data)
+
+    for issue in issues:
+        issue["document"] = filename
+
+    report("done")
+    return {
+        "filename": filename,
+        "doc_type": doc_type,
+        "classifier_tier": classifier_tier,
+        "references": {
+            "citations": (meta or {}).get("references", []),
+            "context": (meta or {}).get("context"),
+        },
+        "issues": issues,
+        "prompt_text": prompt_text.stats() if PROMPT_COMPRESSION else None,
+        "reviewed_path": str(commented_docx_path),
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "first_issue_seconds": first_issue[0] if first_issue else None,
+        "spans": summarize_spans(spans),
+    }
+
+
+def build_report(results: list, total_seconds: float, concurrency: int, breakdown: bool = REPORT_TIMING_BREAKDOWN) -> dict:
+    """
+    Combines per-file results (in upload order) into the JSON compliance
+    report. With breakdown, timings also carries each file's seconds per span.
+    """
+    all_issues_found = []
+    detected_doc_types = []
+    output_file_paths = {}
+    file_timings = {}
+    first_issue = {}
+    classifier_tiers = {}
+    references = {}
+    prompt_text = {}
+
+    for res in results:
+        detected_doc_types.append(res["doc_type"])
+        classifier_tiers[res["filename"]] = res.get("classifier_tier")
+        references[res["filename"]] = res.get("references")
+        prompt_text[res["filename"]] = res.get("prompt_text")
+        output_file_paths[res["filename"]] = res["reviewed_path"]
+        file_timings[res["filename"]] = res["elapsed_seconds"]
+        first_issue[res["filename"]] = res.get("first_issue_seconds")
+        all_issues_found.extend(res["issues"])
+
+    missing_docs_report = check_missing_documents(detected_doc_types)
+
+    timings = {
+        "concurrency": concurrency,
+        "files": file_timings,
+        "first_issue_seconds": first_issue,
+        "total_seconds": round(total_seconds, 3),
+    }
+    if breakdown:
+        timings["breakdown"] = {res["filename"]: res.get("spans", {}) for res in results}
+
+    return {
+        "process": missing_docs_report["process"],
+        "documents_uploaded": len(detected_doc_types),
+        "required_documents": missing_docs_report["required_count"],
+        "missing_documents": missing_docs_report["missing_docs"],
+        "issues_found": all_issues_found,
+        "reviewed_documents": output_file_paths,
+        "classifier_tiers": classifier_tiers,
+        "references": references,
+        "prompt_text": prompt_text,
+        "timings": timings,
+    }
+
+
+def write_report(result: dict, report_id: Optional[str] = None) -> Path:
+    """Writes the report to outputs/report_<id>.json; the id defaults to a fresh uuid so concurrent runs never collide."""
+    json_path = OUTPUT_DIR / f"report_{report_id or uuid.uuid4().hex}.json"
+    with span("report_write"):
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    return json_path
@@ -0,0 +1,206 @@
+"""
+Prepares uploaded document text for the red-flag prompt.
+
+The extracted text carries runs of blank lines, table padding, page numbers,
+headers and footers repeated on every page, duplicated clauses and
+fill-in placeholders ("__________"). None of it helps the review, and all of
+it counts against RED_FLAG_WINDOW_CHARS and the prompt's input tokens.
+compress_text() removes it line by line. It keeps an offset map from the
+compressed text back to the original, so a problematic_text quoted by the
+LLM can still be placed in the uploaded document.
+
+Page numbers, headers and footers are only recognised at page edges, so
+text without page boundaries (a .docx body) loses none of its lines to those
+rules. Table cells are lines of their own, and short or numeric cell values
+("500", "Ordinary") repeat legitimately: a running header or footer must
+hold the same edge position on every page it repeats on, and must not occur
+in the body of any page.
+"""
+import re
+from bisect import bisect_right
+
+from src.llm_client import estimate_tokens
+
+# Non-blank lines at the top and bottom of a page that may be a header,
+# footer or page number. A short line with letters found at one edge
+# position (say, second from the bottom) of at least REPEATED_PAGE_MIN pages
+# (and of half of them), and nowhere else, is a running header or footer;
+# only its first occurrence is kept.
+PAGE_EDGE_LINES = 2
+REPEATED_PAGE_MIN = 2
+REPEATED_LINE_MAX_CHARS = 80
+# Lines with at least this many words are clauses; exact repeats are dropped.
+DUPLICATE_CLAUSE_MIN_WORDS = 8
+
+_WORD = re.compile(r"\S+")
+_LINE_BREAK = re.compile(r"[\n\f]")
+_FILLER = re.compile(r"[_.…=*\-]{4,}")
+_PAGE_NUMBER = re.compile(r"(?i)[-–\s]*(?:page\s*)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?[-–\s]*")
+_HAS_TEXT = re.compile(r"[^\W_]")
+_HAS_LETTER = re.compile(r"[^\W\d_]")
+PLACEHOLDER = "___"
+
+
+class CompressedText:
+    """Compressed text plus the anchors mapping its offsets back to the original."""
+
+    def __init__(self, original: str, text: str, anchors: list, lines_dropped: int):
+        self.original = original
+        self.text = text
+        self._out = [a[0] for a in anchors]
+        self._orig = [a[1] for a in anchors]
+        self._lower = None
+        self.lines_dropped = lines_dropped
+
+    def original_offset(self, pos: int):
+        """Offset in the original text of the character at pos in the compressed text."""
+        if pos is None or pos < 0 or not self._out:
+            return None
+        i = bisect_right(self._out, pos) - 1
+        if i < 0:
+            return None
+        return self._orig[i] + (pos - self._out[i])
+
+    def locate(self, snippet: str):
+        """Original offset of snippet found verbatim or case-insensitively in the compressed text, else None."""
+        snippet = " ".join((snippet or "").split())
+        if not snippet:
+            return None
+        pos = self.text.find(snippet)
+        if pos == -1:
+            if self._lower is None:
+                lower = self.text.lower()
+                # Case folding must not shift offsets for the map to stay valid.
+                self._lower = lower if len(lower) == len(self.text) else ""
+            pos = self._lower.find(snippet.lower()) if self._lower else -1
+        return self.original_offset(pos) if pos != -1 else None
+
+    def stats(self) -> dict:
+        raw_tokens = estimate_tokens(self.original)
+        tokens = estimate_tokens(self.text)
+        return {
+            "raw_chars": len(self.original),
+            "raw_tokens": raw_tokens,
+            "compressed_chars": len(self.text),
+            "compressed_tokens": tokens,
+            "lines_dropped": self.lines_dropped,
+            "reduction": round(1 - tokens / raw_tokens, 3) if raw_tokens else 0.0,
+        }
+
+
+def _line_key(line: str) -> str:
+    return " ".join(line.lower().split())
+
+
+def _pages(lines: list, boundaries: list) -> list:
+    """Indexes of the non-blank lines of each page, in order; a page starts at each offset in boundaries."""
+    pages = {}
+    for i, (start, line) in enumerate(lines):
+        if line.strip():
+            pages.setdefault(bisect_right(boundaries, start), []).append(i)
+    return [pages[k] for k in sorted(pages)]
+
+
+def _page_numbers(lines: list, pages: list) -> set:
+    """
+    Indexes of page-number lines: the first or last line of a page, either
+    labelled ("Page 3", "3 of 12", "3/12") or a bare number that follows the
+    page order on at least REPEATED_PAGE_MIN pages. A bare number that is
+    just the last cell of a table on some page is kept.
+    """
+    found = set()
+    bare = {}
+    for page_no, members in enumerate(pages):
+        for i in {members[0], members[-1]}:
+            key = _line_key(lines[i][1])
+            if not _PAGE_NUMBER.fullmatch(key):
+                continue
+            if key.isdigit():
+                bare.setdefault(int(key) - page_no, []).append(i)
+            else:
+                found.add(i)
+    for rows in bare.values():
+        if len(rows) >= REPEATED_PAGE_MIN:
+            found.update(rows)
+    return found
+
+
+def compress_text(text: str, page_starts=None) -> CompressedText:
+    """
+    Normalises whitespace inside each line, shortens filler runs to
+    PLACEHOLDER and keeps at most one blank line between paragraphs. It drops
+    lines with no letters or digits and repeats of clauses. Pages start at the
+    offsets in page_starts and after every form feed. At their edges it also
+    drops page numbers, and repeats of running headers and footers.
+    """
+    text = text or ""
+    lines = []
+    pos = 0
+    # A form feed ends a line too, so "1\fACME Ltd" is a page number and a header.
+    for brk in _LINE_BREAK.finditer(text):
+        lines.append((pos, text[pos:brk.start()]))
+        pos = brk.end()
+    lines.append((pos, text[pos:]))
+
+    boundaries = sorted(set(page_starts or []) | {m.start() for m in re.finditer("\f", text)})
+    pages = _pages(lines, boundaries) if boundaries else []
+    page_numbers = _page_numbers(lines, pages) if len(pages) > 1 else set()
+    edges = set()
+    edge_pages = {}
+    body = set()
+    for page_no, members in enumerate(pages if len(pages) > 1 else []):
+        members = [i for i in members if i not in page_numbers]
+        positions = {i: ("top", k) for k, i in enumerate(members[:PAGE_EDGE_LINES])}
+        for k, i in enumerate(reversed(members[-PAGE_EDGE_LINES:])):
+            positions.setdefault(i, ("bottom", k))
+        for i in members:
+            key = _line_key(lines[i][1])
+            if i not in positions:
+                body.add(key)
+            elif len(key) <= REPEATED_LINE_MAX_CHARS and _HAS_LETTER.search(key):
+                edges.add(i)
+                edge_pages.setdefault(key, {}).setdefault(positions[i], set()).add(page_no)
+    running = {key for key, at in edge_pages.items()
+               if key not in body and len(at) == 1
+               and len(next(iter(at.values()))) >= max(REPEATED_PAGE_MIN, len(pages) // 2)}
+
+    out = []
+    anchors = []
+    out_pos = 0
+    seen = set()
+    seen_running = set()
+    dropped = 0
+    blank = False
+    for i, (start, line) in enumerate(lines):
+        key = _line_key(line)
+        if not key:
+            blank = bool(out)
+            continue
+        at_edge = i in edges
+        if (not _HAS_TEXT.search(key)
+                or i in page_numbers
+                or (at_edge and key in running and key in seen_running)
+                or (key in seen and len(key.split()) >= DUPLICATE_CLAUSE_MIN_WORDS)):
+            dropped += 1
+            continue
+        seen.add(key)
+        if at_edge and key in running:
+            seen_running.add(key)
+
+        if out:
+            sep = "\n\n" if blank else "\n"
+            out.append(sep)
+            out_pos += len(sep)
+        blank = False
+        first = True
+        for match in _WORD.finditer(line):
+            word = _FILLER.sub(PLACEHOLDER, match.group())
+            if not first:
+                out.append(" ")
+                out_pos += 1
+            anchors.append((out_pos, start + match.start()))
+            out.append(word)
+            out_pos += len(word)
+            first = False
+
+    return CompressedText(text, "".join(out), anchors, dropped)
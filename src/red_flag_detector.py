@@ -1,14 +1,32 @@
 
-import json
+import os
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Union
 
-import docx
 from docx.shared import RGBColor, Pt
 from docx.enum.text import WD_COLOR_INDEX
 
-from src.utils import gemini_generate
+from src.utils import gemini_generate, gemini_stream
+from src.json_stream import IssueStreamParser
+from src.paragraph_index import normalize_whitespace
+from src.document_model import DocumentModel, load_docx, is_heading_line
+from src.metrics import span, in_current_trace, UPLOAD_PROMPT_TOKENS, FIRST_ISSUE_SECONDS
+from src.prompt_compressor import CompressedText, compress_text
+
+# Characters of uploaded text sent per prompt. Longer documents are reviewed
+# in section-aligned windows of this size (map), whose issues are merged (reduce).
+RED_FLAG_WINDOW_CHARS = int(os.getenv("RED_FLAG_WINDOW_CHARS", "15000"))
+RED_FLAG_MAX_CONCURRENCY = int(os.getenv("RED_FLAG_MAX_CONCURRENCY", "4"))
+RED_FLAG_LONG_MODE = os.getenv("RED_FLAG_LONG_MODE", "1") == "1"
+# Strip layout noise and boilerplate from the uploaded text before prompting
+# (src/prompt_compressor.py).
+PROMPT_COMPRESSION = os.getenv("PROMPT_COMPRESSION", "1") == "1"
+# Stream Gemini's output and hand each issue on as soon as its JSON object is complete.
+RED_FLAG_STREAMING = os.getenv("RED_FLAG_STREAMING", "1") == "1"
 
 PROMPT_TEMPLATE = """
 Act as an ADGM Compliance Officer. Analyze the 'Uploaded Document Text' against the 'Reference Text' for legal red flags.
@@ -17,7 +35,7 @@ Act as an ADGM Compliance Officer. Analyze the 'Uploaded Document Text' against
 - "section": The clause number or general section title where the issue was found (e.g., "Appointment of Director(s)").
 - "problematic_text": The exact, verbatim text snippet from the document that contains the issue (e.g., "disputes shall be resolved in UAE Federal Courts").
 - "issue": A concise description of the red flag (e.g., "Incorrect Jurisdiction").
-- "citation": The specific ADGM law or rule that applies (e.g., "Per ADGM Companies Regulations 2020, Art. 17..."). If no specific article applies, cite the general principle.
+- "citation": The specific ADGM law or rule that applies (e.g., "Per ADGM Companies Regulations 2020, Art. 17..."). If no specific article applies, cite the general principle. When the basis is a numbered Reference Text passage, include its label (e.g., "[2]").
 - "severity": "High", "Medium", or "Low".
 - "suggestion": A concrete recommendation on how to fix the issue.
 
@@ -34,104 +52,216 @@ Act as an ADGM Compliance Officer. Analyze the 'Uploaded Document Text' against
 **JSON Output:**
 """
 
-def detect_red_flags(uploaded_text: str, reference_text: str) -> list:
+def _detect_window(uploaded_text: str, reference_text: str, generate, emit=None) -> list:
     """
-    Calls your LLM (gemini_generate) with the prompt and returns the 'issues_found' list.
-    (Unchanged behavior from your original code.)
+    Prompts for one window of text. generate may return the whole response
+    or an iterable of response pieces; either way every issue object that
+    parses is kept (see src/json_stream.py) and passed to emit, streamed
+    issues as soon as they are complete. Issues parsed before an error are
+    returned rather than discarded.
     """
     prompt = PROMPT_TEMPLATE.format(
         reference_text=reference_text or "No official reference text was found for comparison.",
-        uploaded_text=uploaded_text[:15000]
+        uploaded_text=uploaded_text
     )
+    issues = []
+    parser = IssueStreamParser()
     try:
-        response_text = gemini_generate(prompt)
-        clean_json_str = response_text.strip().replace("```json", "").replace("```", "")
-        result = json.loads(clean_json_str)
-        return result.get("issues_found", [])
-    except (json.JSONDecodeError, Exception) as e:
-        print(f"[red_flag_detector] Error processing LLM response for red flag detection: {e}")
-        return []
+        response = generate(prompt)
+        if isinstance(response, str):
+            with span("json_parse"):
+                issues = parser.feed(response)
+            for issue in issues:
+                if emit is not None:
+                    emit(issue)
+        else:
+            for piece in response:
+                for issue in parser.feed(piece):
+                    issues.append(issue)
+                    if emit is not None:
+                        emit(issue)
+    except Exception as e:
+        print(f"[red_flag_detector] Error processing LLM response for red flag detection "
+              f"(keeping {len(issues)} issues parsed before it): {e}")
+    if parser.close():
+        print(f"[red_flag_detector] Skipped {parser.skipped} malformed objects in the LLM response.")
+    return issues
+
+
+def split_windows(text: str, max_chars: int = RED_FLAG_WINDOW_CHARS) -> List[str]:
+    """
+    Splits text into windows of at most max_chars, cutting at section
+    headings where possible, then at line breaks, and only as a last resort
+    in the middle of a line.
+    """
+    sections = []
+    current = []
+    for line in text.splitlines(keepends=True):
+        if current and is_heading_line(line):
+            sections.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("".join(current))
+
+    windows = []
+    window = ""
+    for section in sections:
+        if len(window) + len(section) <= max_chars:
+            window += section
+            continue
+        if window:
+            windows.append(window)
+            window = ""
+        # A single section longer than the window is split by lines.
+        for line in section.splitlines(keepends=True):
+            while len(line) > max_chars:
+                if window:
+                    windows.append(window)
+                    window = ""
+                windows.append(line[:max_chars])
+                line = line[max_chars:]
+            if len(window) + len(line) > max_chars:
+                windows.append(window)
+                window = ""
+            window += line
+    if window.strip():
+        windows.append(window)
+    return windows
+
 
+def _issue_key(issue: dict):
+    section = normalize_whitespace(str(issue.get("section") or "")).lower()
+    text = normalize_whitespace(str(issue.get("problematic_text") or "")).lower()
+    if not text:
+        text = normalize_whitespace(str(issue.get("issue") or "")).lower()
+    return section, text
 
 
-def _normalize_whitespace(s: str) -> str:
-    return " ".join(s.split()) if s is not None else ""
+def merge_issues(issue_lists: List[list]) -> list:
+    """Concatenates per-window issue lists, dropping issues already reported for the same section and text."""
+    merged = []
+    seen = set()
+    for issues in issue_lists:
+        for issue in issues:
+            if not isinstance(issue, dict):
+                continue
+            key = _issue_key(issue)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(issue)
+    return merged
 
-def _find_paragraph_by_text(doc: docx.document.Document, problematic_text: Optional[str], section_text: Optional[str]) -> Optional[docx.text.paragraph.Paragraph]:
+
+def prepare_uploaded_text(uploaded_text: str, page_starts=None) -> CompressedText:
     """
-    Try multiple strategies to find a paragraph:
-      1. exact substring match
-      2. case-insensitive match
-      3. normalized whitespace match
-      4. token overlap (simple fallback)
-      5. section_text matching as last resort
-    Returns the paragraph object or None.
+    Compresses uploaded text for the prompt and records its token counts
+    before and after. page_starts are the offsets at which pages begin, if known.
     """
-    if problematic_text:
-        p_text = problematic_text.strip()
-        if not p_text:
-            problematic_text = None
-
-    
-    if problematic_text:
-        lower_target = problematic_text.lower()
-        for paragraph in doc.paragraphs:
-            try:
-                if problematic_text in paragraph.text:
-                    return paragraph
-            except Exception:
-                pass
-        for paragraph in doc.paragraphs:
-            try:
-                if lower_target in paragraph.text.lower():
-                    return paragraph
-            except Exception:
-                pass
-
-   
-    if problematic_text:
-        norm_target = _normalize_whitespace(problematic_text).lower()
-        for paragraph in doc.paragraphs:
-            if _normalize_whitespace(paragraph.text).lower().find(norm_target) != -1:
-                return paragraph
-
-    
-    if problematic_text:
-        import re
-        tokens = re.findall(r"\w+", problematic_text.lower())
-        if tokens:
-            token_set = set(tokens)
-            for paragraph in doc.paragraphs:
-                p_tokens = set(re.findall(r"\w+", paragraph.text.lower()))
-                if not p_tokens:
-                    continue
-                
-                inter = token_set.intersection(p_tokens)
-                if len(inter) / max(1, len(token_set)) >= 0.6:
-                    return paragraph
+    with span("compress"):
+        compressed = compress_text(uploaded_text, page_starts)
+    stats = compressed.stats()
+    UPLOAD_PROMPT_TOKENS.observe(stats["raw_tokens"], stage="raw")
+    UPLOAD_PROMPT_TOKENS.observe(stats["compressed_tokens"], stage="compressed")
+    return compressed
+
+
+def detect_red_flags(uploaded_text: Union[str, CompressedText], reference_text: str, generate=None,
+                     long_mode: Optional[bool] = None, compress: Optional[bool] = None,
+                     stream: Optional[bool] = None, on_issue=None) -> list:
+    """
+    Calls your LLM (gemini_stream or gemini_generate, or the given generate
+    callable) with the prompt and returns the 'issues_found' list.
+
+    With stream on (RED_FLAG_STREAMING by default) and no generate given,
+    Gemini's output is parsed as it arrives. on_issue, if given, is called
+    with each new (deduplicated) issue as soon as it is complete, possibly
+    from several threads at once.
+
+    When compress is on (PROMPT_COMPRESSION by default) the prompt carries
+    the compressed text (see prepare_uploaded_text), which may also be passed
+    in directly. Each issue whose problematic_text is found there gets
+    issue["offset"] set to the matching character offset in the original
+    uploaded text.
+
+    Documents longer than RED_FLAG_WINDOW_CHARS are reviewed in full when
+    long_mode is on (RED_FLAG_LONG_MODE by default): each section-aligned
+    window is prompted concurrently, at most RED_FLAG_MAX_CONCURRENCY at a
+    time, and the results are merged and deduplicated. Otherwise only the
+    first RED_FLAG_WINDOW_CHARS characters are reviewed.
+    """
+    stream = RED_FLAG_STREAMING if stream is None else stream
+    generate = generate or (gemini_stream if stream else gemini_generate)
+    long_mode = RED_FLAG_LONG_MODE if long_mode is None else long_mode
+    compress = PROMPT_COMPRESSION if compress is None else compress
+
+    compressed = None
+    if isinstance(uploaded_text, CompressedText):
+        compressed = uploaded_text
+    elif compress:
+        compressed = prepare_uploaded_text(uploaded_text)
+    if compressed is not None:
+        uploaded_text = compressed.text
+
+    started = time.perf_counter()
+    seen = set()
+    lock = threading.Lock()
+
+    def emit(issue):
+        if compressed is not None and issue.get("offset") is None:
+            issue["offset"] = compressed.locate(issue.get("problematic_text"))
+        key = _issue_key(issue)
+        with lock:
+            if key in seen:
+                return
+            if not seen:
+                FIRST_ISSUE_SECONDS.observe(time.perf_counter() - started)
+            seen.add(key)
+        if on_issue is not None:
+            on_issue(issue)
 
-    
-    if section_text:
-        st = section_text.strip()
-        for paragraph in doc.paragraphs:
-            if st in paragraph.text:
-                return paragraph
-        for paragraph in doc.paragraphs:
-            if st.lower() in paragraph.text.lower():
-                return paragraph
-        st_norm = _normalize_whitespace(st).lower()
-        for paragraph in doc.paragraphs:
-            if _normalize_whitespace(paragraph.text).lower().find(st_norm) != -1:
-                return paragraph
+    if not long_mode or len(uploaded_text) <= RED_FLAG_WINDOW_CHARS:
+        return _detect_window(uploaded_text[:RED_FLAG_WINDOW_CHARS], reference_text, generate, emit)
 
-    return None
+    windows = split_windows(uploaded_text, RED_FLAG_WINDOW_CHARS)
+    with ThreadPoolExecutor(max_workers=max(1, min(RED_FLAG_MAX_CONCURRENCY, len(windows)))) as pool:
+        detect = in_current_trace(_detect_window)
+        results = list(pool.map(lambda w: detect(w, reference_text, generate, emit), windows))
+    return merge_issues(results)
 
 
+def locate_issues(document: DocumentModel, issues: List[dict]) -> List[dict]:
+    """
+    Resolves every issue to a character offset in document.text (stored as
+    issue["offset"], None when nothing matches) using the document's
+    paragraph index, so later stages can place it without searching again.
+    """
+    for issue in issues:
+        if issue.get("offset") is None:
+            issue["offset"] = document.locate(issue.get("problematic_text"), issue.get("section"))
+    return issues
+
 
 def add_comments_to_docx(original_docx_path: Path, issues: List[dict], output_docx_path: Path, debug: bool = False):
+    """Loads a .docx from disk and annotates it; see annotate_document."""
+    try:
+        document = load_docx(Path(original_docx_path).name, Path(original_docx_path).read_bytes())
+    except Exception as e:
+        print(f"[add_comments_to_docx] Could not open DOCX: {e}")
+        shutil.copy(str(original_docx_path), str(output_docx_path))
+        return
+    annotate_document(document, issues, output_docx_path, debug=debug)
+
+
+def annotate_document(document: DocumentModel, issues: List[dict], output_docx_path: Path, debug: bool = False):
     """
+    Issues are placed by their character offset in document.text (see
+    locate_issues); issues without an offset are located on the fly. The
+    already-parsed python-docx document is edited in place and saved.
+
     For each issue:
-      - try to find the paragraph using multiple heuristics
+      - find the paragraph containing the issue's offset
       - if problematic_text is found inside the paragraph, reconstruct the paragraph
         as: [before][highlighted_problematic_text][after]
       - insert an annotation paragraph directly AFTER the flagged paragraph with:
@@ -139,7 +269,8 @@ def add_comments_to_docx(original_docx_path: Path, issues: List[dict], output_do
       - if matching fails, try to add the annotation at the end of document (so nothing is lost)
     """
     try:
-        doc = docx.Document(str(original_docx_path))
+        doc = document.ensure_docx()
+        locate_issues(document, issues)
 
         for idx, issue in enumerate(issues):
             problem_text = issue.get('problematic_text')
@@ -147,7 +278,8 @@ def add_comments_to_docx(original_docx_path: Path, issues: List[dict], output_do
             if debug:
                 print(f"[add_comments] processing issue {idx}: section='{section_text}' problem_text='{problem_text}'")
 
-            target_paragraph = _find_paragraph_by_text(doc, problem_text, section_text)
+            match_span = document.paragraph_at(issue.get("offset"))
+            target_paragraph = match_span.paragraph if match_span is not None else None
 
             if target_paragraph is None:
                 
@@ -200,8 +332,8 @@ def add_comments_to_docx(original_docx_path: Path, issues: List[dict], output_do
                         print(f"[add_comments] highlighted problem_text in paragraph: '{mid}'")
                 else:
                     
-                    norm_para = _normalize_whitespace(para_text).lower()
-                    norm_problem = _normalize_whitespace(problem_text).lower()
+                    norm_para = normalize_whitespace(para_text).lower()
+                    norm_problem = normalize_whitespace(problem_text).lower()
                     pos2 = norm_para.find(norm_problem)
                     if pos2 != -1:
                       
@@ -256,12 +388,14 @@ def add_comments_to_docx(original_docx_path: Path, issues: List[dict], output_do
                     run.font.color.rgb = RGBColor(0x44, 0x44, 0x44)
 
         
-        doc.save(str(output_docx_path))
+        document.save(output_docx_path)
 
     except Exception as e:
         print(f"[add_comments_to_docx] Critical error while writing DOCX: {e}")
         
         try:
-            shutil.copy(str(original_docx_path), str(output_docx_path))
+            if document.kind != "docx":
+                raise ValueError(f"no .docx original to fall back to for a {document.kind} upload")
+            Path(output_docx_path).write_bytes(document.source_bytes)
         except Exception as e2:
             print(f"[add_comments_to_docx] Also failed to copy original: {e2}")
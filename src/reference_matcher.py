@@ -1,8 +1,9 @@
-from src.utils import chroma_client, embed_texts
+from src.utils import embed_texts
+from src.retriever import get_reference_collection
 
 def match_reference(text, top_k=1):
     try:
-        col = chroma_client.get_collection("adgm_docs")
+        col = get_reference_collection()
     except Exception:
         return None, None
 
@@ -1,24 +1,233 @@
+import os
+import re
+from src.utils import get_chroma_client, embed_texts, EMBEDDING
+from src.embedding_backends import check_embedding_metadata
+from src.metrics import span, REFERENCE_CONTEXT_TOKENS
+from src.vector_index import get_vector_index
+from src.bm25_index import get_bm25_index
+from src.context_packer import pack_references
 
-from src.utils import chroma_client, embed_texts
+# "single" embeds the whole upload as one query (MiniLM truncates it to its
+# first ~256 tokens); "chunked" embeds clause-sized pieces of the upload and
+# fuses the per-piece rankings; "hybrid" additionally fuses in a BM25 ranking
+# over the reference chunks, for exact terms the embeddings blur.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "chunked")
+# Ranked candidates considered per review; they are packed into at most
+# REFERENCE_TOKEN_BUDGET tokens of context (src/context_packer.py).
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+# Typed lookups search the document type's own collection (written at ingest)
+# instead of filtering the shared one.
+RETRIEVAL_PARTITIONS = os.getenv("RETRIEVAL_PARTITIONS", "1") == "1"
 
-def retrieve_reference(doc_text, doc_type=None, top_k=1):
+# "chroma" queries the persistent Chroma store; "numpy" answers from the
+# in-process memory-mapped index exported at ingest (src/vector_index.py).
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "chroma")
+
+COLLECTION_NAME = "adgm_docs"
+
+QUERY_CHUNK_WORDS = 150
+MAX_QUERY_CHUNKS = 64
+RRF_K = 60
+# Candidates taken from each ranking before hybrid fusion, per top_k result.
+HYBRID_CANDIDATES_PER_RESULT = 4
+
+# Clause boundaries: blank lines, numbered clauses ("1.", "4.2", "(a)"),
+# "Article 12" / "Clause 3" headings and short all-caps headings.
+_CLAUSE_BOUNDARY = re.compile(
+    r"\n\s*\n"
+    r"|\n(?=[ \t]*(?:\d+(?:\.\d+)*[.)]\s|\([a-z0-9]{1,4}\)\s|(?:Article|Clause|Section)\s+\d+|[A-Z][A-Z ,&'\-]{3,}\n))"
+)
+
+
+def split_clauses(text: str, max_words: int = QUERY_CHUNK_WORDS) -> list:
+    """
+    Splits text into clause-sized pieces of at most max_words words. Small
+    neighbouring clauses are merged so each piece carries enough context to
+    embed well; long clauses are cut at the word limit.
+    """
+    pieces = []
+    current = []
+    for block in _CLAUSE_BOUNDARY.split(text or ""):
+        words = block.split()
+        if not words:
+            continue
+        if current and len(current) + len(words) > max_words:
+            pieces.append(" ".join(current))
+            current = []
+        while len(words) > max_words:
+            pieces.append(" ".join(words[:max_words]))
+            words = words[max_words:]
+        current.extend(words)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _sample_evenly(items: list, limit: int) -> list:
+    if len(items) <= limit:
+        return items
+    step = len(items) / limit
+    return [items[int(i * step)] for i in range(limit)]
+
+
+def _has_results(res) -> bool:
+    return bool(res and res.get("ids") and any(res["ids"]))
+
+
+def get_reference_collection():
+    """
+    The reference corpus for the configured RETRIEVAL_BACKEND; raises if it is
+    unavailable or was embedded by a different backend, model or dimension.
+    """
+    if RETRIEVAL_BACKEND == "numpy":
+        index = get_vector_index()
+        check_embedding_metadata(index.metadata, EMBEDDING, "Vector index")
+        return index
+    col = get_chroma_client().get_collection(COLLECTION_NAME)
+    check_embedding_metadata(col.metadata, EMBEDDING, f"Collection {COLLECTION_NAME}")
+    return col
+
+
+def _open_reference_collection():
+    """get_reference_collection(), or None with the reason logged, so reviews never silently run without references."""
+    try:
+        return get_reference_collection()
+    except Exception as e:
+        print(f"[retriever] Reference corpus unavailable, reviewing without reference context: {e}")
+        return None
+
+
+def partition_name(doc_type: str) -> str:
+    """Name of the Chroma collection holding only the reference chunks of doc_type."""
+    slug = re.sub(r"[^a-z0-9]+", "_", doc_type.lower()).strip("_") or "untyped"
+    return f"{COLLECTION_NAME}__{slug}"[:63].rstrip("_")
+
+
+def _query(col, embeddings, n_results, doc_type=None):
+    with span(f"{RETRIEVAL_BACKEND}_query"):
+        # The NumPy index filters by doc_type in memory, so it needs no partitions.
+        if doc_type and RETRIEVAL_PARTITIONS and RETRIEVAL_BACKEND == "chroma":
+            try:
+                partition = get_chroma_client().get_collection(partition_name(doc_type))
+                res = partition.query(query_embeddings=embeddings, n_results=n_results)
+                if _has_results(res):
+                    return res
+            except Exception:
+                pass
+        elif doc_type:
+            try:
+                res = col.query(query_embeddings=embeddings, n_results=n_results, where={"doc_type": doc_type})
+                if _has_results(res):
+                    return res
+            except Exception:
+                pass
+        return col.query(query_embeddings=embeddings, n_results=n_results)
+
+
+def reciprocal_rank_fusion(res, k: int = RRF_K) -> list:
+    """
+    Fuses the per-query rankings of a multi-embedding Chroma result into one
+    deduplicated list, scoring each chunk by sum(1 / (k + rank)).
+    """
+    fused = {}
+    for q, ids in enumerate(res.get("ids") or []):
+        for rank, chunk_id in enumerate(ids):
+            entry = fused.get(chunk_id)
+            if entry is None:
+                entry = fused[chunk_id] = {
+                    "id": chunk_id,
+                    "text": res["documents"][q][rank],
+                    "metadata": (res.get("metadatas") or [[]])[q][rank] or {},
+                    "score": 0.0,
+                }
+            entry["score"] += 1.0 / (k + rank + 1)
+    return sorted(fused.values(), key=lambda e: e["score"], reverse=True)
+
+
+def retrieve_references(doc_text, doc_type=None, top_k=RETRIEVAL_TOP_K):
+    """
+    Chunked multi-vector retrieval: embeds clause-sized pieces of the upload
+    in one batch, issues a single multi-embedding query and returns the
+    RRF-fused, deduplicated top_k chunks as dicts (id, text, metadata, score).
+    """
+    col = _open_reference_collection()
+    if col is None:
+        return []
+
+    chunks = _sample_evenly(split_clauses(doc_text), MAX_QUERY_CHUNKS)
+    if not chunks:
+        return []
+
+    embs = embed_texts(chunks)
+    res = _query(col, embs, top_k, doc_type)
+    if not _has_results(res):
+        return []
+    return reciprocal_rank_fusion(res)[:top_k]
+
+
+def _lexical_references(doc_text, doc_type, n_results):
     try:
-        col = chroma_client.get_collection("adgm_docs")
+        index = get_bm25_index()
     except Exception:
+        return []
+    with span("bm25_query"):
+        res = None
+        if doc_type:
+            res = index.query(doc_text, n_results, where={"doc_type": doc_type})
+        if not res or not res["ids"]:
+            res = index.query(doc_text, n_results)
+    return [
+        {"id": i, "text": text, "metadata": meta or {}, "score": score}
+        for i, text, meta, score in zip(res["ids"], res["documents"], res["metadatas"], res["scores"])
+    ]
+
+
+def hybrid_fusion(rankings, k: int = RRF_K) -> list:
+    """Reciprocal-rank fusion of several ranked lists of reference dicts, deduplicated by id."""
+    fused = {}
+    for ranking in rankings:
+        for rank, ref in enumerate(ranking):
+            entry = fused.get(ref["id"])
+            if entry is None:
+                entry = fused[ref["id"]] = dict(ref, score=0.0)
+            entry["score"] += 1.0 / (k + rank + 1)
+    return sorted(fused.values(), key=lambda e: e["score"], reverse=True)
+
+
+def retrieve_hybrid(doc_text, doc_type=None, top_k=RETRIEVAL_TOP_K):
+    """
+    Dense chunked retrieval fused (RRF) with a BM25 ranking of the reference
+    chunks for the whole upload. Falls back to dense results alone when no
+    BM25 index has been built.
+    """
+    candidates = max(top_k * HYBRID_CANDIDATES_PER_RESULT, top_k)
+    dense = retrieve_references(doc_text, doc_type=doc_type, top_k=candidates)
+    lexical = _lexical_references(doc_text, doc_type, candidates)
+    return hybrid_fusion([dense, lexical])[:top_k]
+
+
+def retrieve_reference(doc_text, doc_type=None, top_k=1, mode=None):
+    mode = mode or RETRIEVAL_MODE
+    if mode in ("chunked", "hybrid"):
+        retrieve = retrieve_hybrid if mode == "hybrid" else retrieve_references
+        refs = retrieve(doc_text, doc_type=doc_type, top_k=top_k)
+        if not refs:
+            return None, None
+        with span("context_pack"):
+            text, citations, stats = pack_references(refs)
+        REFERENCE_CONTEXT_TOKENS.observe(stats["packed_tokens"])
+        meta = dict(refs[0]["metadata"])
+        meta["references"] = citations
+        meta["context"] = stats
+        return text, meta
+
+    col = _open_reference_collection()
+    if col is None:
         return None, None
 
     emb = embed_texts([doc_text])
 
-    if doc_type:
-        try:
-            res = col.query(query_embeddings=emb, n_results=top_k, where={"doc_type": doc_type})
-            if res and res.get("documents") and res["documents"][0]:
-                return res["documents"][0][0], res["metadatas"][0][0]
-        except Exception:
-            pass
-
-    
-    res = col.query(query_embeddings=emb, n_results=top_k)
+    res = _query(col, emb, top_k, doc_type)
     if not res or not res.get("documents") or not res["documents"][0]:
         return None, None
     return res["documents"][0][0], res["metadatas"][0][0]
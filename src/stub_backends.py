@@ -0,0 +1,124 @@
+"""
+Offline stand-ins for Gemini and the sentence-transformer model, used for
+load testing and local runs without network access or model downloads.
+For an offline embedder that retrieves well, see EMBED_BACKEND=ngram
+(src/embedding_backends.py).
+
+Select them with LLM_BACKEND=fake and EMBED_BACKEND=hash.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import time
+
+import numpy as np
+
+from src.embedding_backends import EmbeddingBackend
+from src.llm_client import LLMBackend
+
+STUB_LLM_LATENCY_SECONDS = float(os.getenv("STUB_LLM_LATENCY_SECONDS", "0.5"))
+STUB_LLM_LATENCY_JITTER = float(os.getenv("STUB_LLM_LATENCY_JITTER", "0.1"))
+STUB_LLM_ISSUES = int(os.getenv("STUB_LLM_ISSUES", "3"))
+STUB_EMBED_DIM = int(os.getenv("STUB_EMBED_DIM", "384"))
+# Pieces a streamed fake response is split into; the latency is spread over them.
+STUB_STREAM_PIECES = 20
+
+_UPLOADED_TEXT = re.compile(r"\*\*Uploaded Document Text:\*\*\n(.*?)\n---", re.S)
+_SEVERITIES = ("High", "Medium", "Low")
+
+
+class FakeLLMBackend(LLMBackend):
+    """
+    Deterministic fake LLM. Red-flag prompts get a valid "issues_found" JSON
+    object quoting lines of the uploaded text (so issues can be located and
+    annotated); any other prompt gets a short document-type label. Each call
+    sleeps for latency_seconds plus up to jitter_seconds to mimic the API;
+    stream() spreads that delay evenly over STUB_STREAM_PIECES pieces.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_seconds: float = STUB_LLM_LATENCY_SECONDS,
+                 jitter_seconds: float = STUB_LLM_LATENCY_JITTER, issues: int = STUB_LLM_ISSUES):
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.issues = issues
+
+    def generate(self, prompt: str, model: str, temperature: float) -> str:
+        delay = self._delay()
+        if delay > 0:
+            time.sleep(delay)
+        return self._respond(prompt)
+
+    def stream(self, prompt: str, model: str, temperature: float):
+        text = self._respond(prompt)
+        step = max(1, -(-len(text) // STUB_STREAM_PIECES))
+        pieces = [text[i:i + step] for i in range(0, len(text), step)]
+        delay = self._delay() / max(1, len(pieces))
+        for piece in pieces:
+            if delay > 0:
+                time.sleep(delay)
+            yield piece
+
+    def _delay(self) -> float:
+        return self.latency_seconds + random.uniform(0, self.jitter_seconds)
+
+    def _respond(self, prompt: str) -> str:
+        match = _UPLOADED_TEXT.search(prompt)
+        if match is None:
+            return "Shareholder Resolution"
+        return json.dumps({"issues_found": self._issues(match.group(1))}, indent=2)
+
+    def _issues(self, uploaded_text: str) -> list:
+        lines = [line.strip() for line in uploaded_text.splitlines() if len(line.strip()) >= 40]
+        if not lines:
+            return []
+        step = max(1, len(lines) // max(1, self.issues))
+        issues = []
+        for n, line in enumerate(lines[::step][:self.issues]):
+            words = line.split()
+            issues.append({
+                "section": " ".join(words[:4]),
+                "problematic_text": " ".join(words[:12]),
+                "issue": f"Stub issue {n + 1}",
+                "citation": "Per ADGM Companies Regulations 2020 (stub citation).",
+                "severity": _SEVERITIES[n % len(_SEVERITIES)],
+                "suggestion": "Review this clause against the ADGM template.",
+            })
+        return issues
+
+
+def hash_model_name(dim: int = STUB_EMBED_DIM) -> str:
+    """Name of the hash embedder's vector space; it includes the dimension so each width gets its own cache."""
+    return f"hash-embedder-{dim}"
+
+
+class HashEmbedder(EmbeddingBackend):
+    """
+    Cheap deterministic embedder with the SentenceTransformer.encode()
+    interface: words are hashed into a fixed number of buckets and the
+    counts are L2-normalised.
+    """
+
+    backend = "hash"
+
+    def __init__(self, dim: int = STUB_EMBED_DIM):
+        self.dim = dim
+        self.name = hash_model_name(dim)
+
+    def _bucket(self, word: str) -> int:
+        return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little") % self.dim
+
+    def encode(self, texts, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                out[row, self._bucket(word)] += 1.0
+            norm = np.linalg.norm(out[row])
+            if norm:
+                out[row] /= norm
+        return out
@@ -1,26 +1,198 @@
 import os
+import threading
+import time
 from dotenv import load_dotenv
-import google.generativeai as genai
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
 from pathlib import Path
 
+from src.llm_cache import llm_cache, make_cache_key, LLM_CACHE_DISABLED
+from src.embedding_cache import EmbeddingCache, EMBED_CACHE_DISABLED
+from src.llm_client import LLMClient, GeminiBackend, estimate_tokens
+from src.embed_batcher import EmbeddingBatcher, EMBED_BATCHING
+from src.embedding_backends import make_embed_backend, describe_backend
+from src import metrics
+
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# The embedding model, the Chroma client and the Gemini SDK are expensive to
+# import and initialise, so they are created on first use (or by warmup())
+# rather than at import time. Each getter is a thread-safe singleton.
+
+# EMBED_BACKEND selects the embedder: "sentence-transformers" (default),
+# "ngram" or "hash" (src/embedding_backends.py). LLM_BACKEND selects "gemini"
+# or the offline "fake" in src/stub_backends.py.
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "sentence-transformers")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
 
-EMBED_MODEL = SentenceTransformer("all-MiniLM-L6-v2")
+# Backend, model name and dimension recorded with stored vectors.
+EMBEDDING = describe_backend(EMBED_BACKEND)
+EMBED_MODEL_NAME = EMBEDDING["embed_model"]
+embedding_cache = EmbeddingCache(EMBED_MODEL_NAME)
 
 CHROMA_PERSIST_DIR = Path("data_sources/chroma_store")
-CHROMA_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
-chroma_client = chromadb.PersistentClient(path=str(CHROMA_PERSIST_DIR))
+
+_embed_model = None
+_embed_lock = threading.Lock()
+_chroma_client = None
+_chroma_lock = threading.Lock()
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def get_embed_model():
+    global _embed_model
+    if _embed_model is None:
+        with _embed_lock:
+            if _embed_model is None:
+                _embed_model = make_embed_backend(EMBED_BACKEND)
+    return _embed_model
+
+def embedding_metadata() -> dict:
+    """EMBEDDING with the dimension of the loaded model, for recording with newly written vectors."""
+    return dict(EMBEDDING, embed_dim=int(get_embed_model().dim))
+
+def get_chroma_client():
+    global _chroma_client
+    if _chroma_client is None:
+        with _chroma_lock:
+            if _chroma_client is None:
+                import chromadb
+                CHROMA_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+                _chroma_client = chromadb.PersistentClient(path=str(CHROMA_PERSIST_DIR))
+    return _chroma_client
+
+def get_genai():
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _genai = genai
+    return _genai
+
+def _make_llm_backend():
+    if LLM_BACKEND == "fake":
+        from src.stub_backends import FakeLLMBackend
+        return FakeLLMBackend()
+    return GeminiBackend(get_genai)
+
+# Shared by every caller of gemini_generate; swap the backend with
+# llm_client.backend = ... to run against a fake provider.
+llm_client = LLMClient(_make_llm_backend())
+
+metrics.register_callback("adgm_llm_queue_depth", "LLM calls waiting for a concurrency slot or rate limit.", "gauge",
+                          lambda: llm_client.waiting)
+metrics.register_callback("adgm_llm_in_flight", "LLM calls currently in progress.", "gauge", lambda: llm_client.active)
+metrics.register_callback("adgm_llm_retries_total", "LLM calls retried after a transient error.", "counter",
+                          lambda: llm_client.retries)
+metrics.register_callback("adgm_llm_coalesced_total", "LLM requests served by an identical in-flight call.", "counter",
+                          lambda: llm_client.coalesced)
+
+def __getattr__(name):
+    # Backwards compatibility for code that still reads the old module globals.
+    if name == "EMBED_MODEL":
+        return get_embed_model()
+    if name == "chroma_client":
+        return get_chroma_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def warmup() -> dict:
+    """Initialises every lazy singleton and returns the seconds each one took."""
+    timings = {}
+    getters = [("embed_model", get_embed_model), ("chroma_client", get_chroma_client)]
+    if LLM_BACKEND == "gemini":
+        getters.append(("genai", get_genai))
+    for name, getter in getters:
+        started = time.perf_counter()
+        getter()
+        timings[name] = round(time.perf_counter() - started, 3)
+    return timings
+
+def warm_state() -> dict:
+    return {
+        "embed_model": _embed_model is not None,
+        "chroma_client": _chroma_client is not None,
+        "genai": _genai is not None,
+    }
+
+def _encode_direct(texts):
+    return get_embed_model().encode(texts, show_progress_bar=False)
+
+# Concurrent small encode calls are merged into shared batches (src/embed_batcher.py).
+embed_batcher = EmbeddingBatcher(_encode_direct)
+
+def _encode(texts):
+    if EMBED_BATCHING:
+        return embed_batcher.encode(texts)
+    return _encode_direct(texts)
 
 def embed_texts(texts):
-    
-    return EMBED_MODEL.encode(texts, show_progress_bar=False).tolist()
+    """
+    Embeds texts with the sentence-transformer model. Vectors are served from
+    the persistent embedding cache where possible; only cache misses are
+    encoded, in a single batch that may be shared with concurrent callers.
+    """
+    with metrics.span("embed"):
+        if EMBED_CACHE_DISABLED:
+            return _encode(texts).tolist()
+        encoded = []
+
+        def encode_misses(missing):
+            encoded.extend(missing)
+            return _encode(missing)
+
+        vectors = embedding_cache.get_or_compute(texts, encode_misses)
+        # Counted with the LLM cache in adgm_cache_requests_total; repeats within texts are hits.
+        metrics.CACHE_REQUESTS.inc(len(texts) - len(encoded), cache="embedding", result="hit")
+        metrics.CACHE_REQUESTS.inc(len(encoded), cache="embedding", result="miss")
+        return vectors.tolist()
+
+def gemini_generate(prompt, model="gemini-2.5-pro", temperature=0.6, use_cache=True):
+    """
+    Returns the model's text response for prompt. Identical (backend, model,
+    temperature, prompt) requests are served from the on-disk LLM cache unless use_cache is
+    False or LLM_CACHE_DISABLED=1. Misses go through the shared llm_client,
+    which rate-limits, retries and coalesces identical in-flight prompts.
+    """
+    use_cache = use_cache and not LLM_CACHE_DISABLED
+    if use_cache:
+        key = make_cache_key(model, temperature, prompt, llm_client.backend.name)
+        cached = llm_cache.get(key)
+        metrics.CACHE_REQUESTS.inc(cache="llm", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached
+
+    metrics.LLM_PROMPT_TOKENS.observe(estimate_tokens(prompt))
+    with metrics.span("llm_call"):
+        text = llm_client.generate(prompt, model, temperature)
+    if use_cache and text:
+        llm_cache.put(key, model, text)
+    return text
+
+def gemini_stream(prompt, model="gemini-2.5-pro", temperature=0.6, use_cache=True):
+    """
+    Streaming counterpart of gemini_generate: yields the response in pieces
+    as they arrive. A cached response is yielded whole, and a completed
+    stream is written to the cache.
+    """
+    use_cache = use_cache and not LLM_CACHE_DISABLED
+    if use_cache:
+        key = make_cache_key(model, temperature, prompt, llm_client.backend.name)
+        cached = llm_cache.get(key)
+        metrics.CACHE_REQUESTS.inc(cache="llm", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            yield cached
+            return
 
-def gemini_generate(prompt, model="gemini-2.5-pro", temperature=0.6):
-    
-    response = genai.GenerativeModel(model).generate_content(prompt)
-    return response.text
+    metrics.LLM_PROMPT_TOKENS.observe(estimate_tokens(prompt))
+    pieces = []
+    with metrics.span("llm_call"):
+        started = time.perf_counter()
+        for piece in llm_client.stream(prompt, model, temperature):
+            if not pieces:
+                metrics.LLM_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - started)
+            pieces.append(piece)
+            yield piece
+    text = "".join(pieces)
+    if use_cache and text:
+        llm_cache.put(key, model, text)
@@ -0,0 +1,207 @@
+"""
+In-process vector index over the reference corpus.
+
+All chunk embeddings live in one L2-normalised float32 matrix memory-mapped
+from VECTOR_INDEX_DIR/vectors.f32, next to a JSON side table of ids,
+documents and metadata. A query is a single matrix product, so top-k costs
+no SQLite round trips or serialisation. VectorIndex.query() returns results
+in the same shape as a Chroma collection's query(), so the retriever and
+reference matcher can use either backend.
+
+The index is exported from the Chroma collection at the end of ingestion
+(or with `python -m src.vector_index`). The two files are replaced one after
+the other, so meta.json records the row count and SHA-256 of the vectors it
+was written with; a load that pairs it with other vectors is rejected.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+VECTOR_INDEX_DIR = Path(os.getenv("VECTOR_INDEX_DIR", "data_sources/vector_index"))
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _vectors_digest(data) -> str:
+    return hashlib.sha256(np.ascontiguousarray(data).reshape(-1).view(np.uint8)).hexdigest()
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorIndex:
+    def __init__(self, root: Path = VECTOR_INDEX_DIR):
+        self.root = Path(root)
+        with open(self.root / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.embed_model = meta["embed_model"]
+        # Indexes written before backends were recorded only have the model name.
+        self.embed_backend = meta.get("embed_backend")
+        self.dim = meta["dim"]
+        self.ids = meta["ids"]
+        self.documents = meta["documents"]
+        self.metadatas = meta["metadatas"]
+        vectors_path = self.root / "vectors.f32"
+        size = vectors_path.stat().st_size if vectors_path.exists() else 0
+        if meta.get("count", len(self.ids)) != len(self.ids) or size != len(self.ids) * self.dim * 4:
+            raise ValueError(f"{vectors_path} holds {size} bytes, not {len(self.ids)} vectors of "
+                             f"dimension {self.dim}; the index is being rewritten or is corrupt.")
+        if self.ids:
+            self.matrix = np.memmap(vectors_path, dtype=np.float32, mode="r",
+                                    shape=(len(self.ids), self.dim))
+            # Indexes written before checksums were recorded are only checked by size.
+            if meta.get("sha256") and _vectors_digest(self.matrix) != meta["sha256"]:
+                raise ValueError(f"{vectors_path} does not match the checksum in meta.json; "
+                                 "the index is being rewritten or is corrupt.")
+        else:
+            self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._subsets = {}
+        self._lock = threading.Lock()
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def metadata(self) -> dict:
+        """The embedder the vectors were written with, like a Chroma collection's metadata."""
+        return {"embed_backend": self.embed_backend, "embed_model": self.embed_model, "embed_dim": self.dim or None}
+
+    def get(self, include=None, limit: int = None) -> dict:
+        """Chroma-style get() of the first limit chunks: ids plus the included fields."""
+        include = include or ["documents", "metadatas"]
+        n = len(self.ids) if limit is None else min(limit, len(self.ids))
+        out = {"ids": self.ids[:n]}
+        if "embeddings" in include:
+            out["embeddings"] = np.asarray(self.matrix[:n])
+        if "documents" in include:
+            out["documents"] = self.documents[:n]
+        if "metadatas" in include:
+            out["metadatas"] = self.metadatas[:n]
+        return out
+
+    def _subset(self, where):
+        """(row numbers, matrix rows) matching every key/value in where; cached per filter."""
+        key = tuple(sorted(where.items()))
+        subset = self._subsets.get(key)
+        if subset is None:
+            rows = np.array([i for i, m in enumerate(self.metadatas)
+                             if all((m or {}).get(k) == v for k, v in where.items())], dtype=np.int64)
+            subset = (rows, np.ascontiguousarray(self.matrix[rows]))
+            with self._lock:
+                self._subsets[key] = subset
+        return subset
+
+    def query(self, query_embeddings, n_results: int = 1, where: dict = None) -> dict:
+        """Exact cosine top-k; returns {"ids", "documents", "metadatas", "distances"} lists per query."""
+        queries = _normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        if where:
+            rows, matrix = self._subset(where)
+        else:
+            rows, matrix = None, self.matrix
+
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        k = min(n_results, matrix.shape[0])
+        if k <= 0:
+            for key in out:
+                out[key] = [[] for _ in range(len(queries))]
+            return out
+
+        scores = queries @ matrix.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for q in range(len(queries)):
+            order = top[q][np.argsort(-scores[q, top[q]])]
+            hits = order if rows is None else rows[order]
+            out["ids"].append([self.ids[i] for i in hits])
+            out["documents"].append([self.documents[i] for i in hits])
+            out["metadatas"].append([self.metadatas[i] for i in hits])
+            out["distances"].append([float(1.0 - scores[q, j]) for j in order])
+        return out
+
+
+def write_vector_index(ids, embeddings, documents, metadatas, embed_model: str, root: Path = VECTOR_INDEX_DIR,
+                       embed_backend: str = None):
+    """
+    Writes a new index: the vectors first, then the side table readers key on.
+    Each file is replaced atomically, and the side table records the count and
+    checksum of its vectors so a reader between the two replaces can tell.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.size == 0:
+        matrix = np.zeros((0, 0), dtype=np.float32)
+    matrix = np.ascontiguousarray(_normalize_rows(matrix.reshape(len(ids), -1)) if len(ids) else matrix,
+                                  dtype=np.float32)
+
+    tmp_vectors = root / "vectors.f32.tmp"
+    matrix.tofile(tmp_vectors)
+    tmp_vectors.replace(root / "vectors.f32")
+
+    meta = {
+        "embed_backend": embed_backend,
+        "embed_model": embed_model,
+        "dim": int(matrix.shape[1]) if len(ids) else 0,
+        "count": len(ids),
+        "sha256": _vectors_digest(matrix),
+        "ids": list(ids),
+        "documents": list(documents),
+        "metadatas": list(metadatas),
+    }
+    tmp_meta = root / "meta.json.tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    tmp_meta.replace(root / "meta.json")
+    print(f"[vector_index] Wrote {len(ids)} vectors to {root}")
+
+
+def export_collection(col, embed_model: str, root: Path = VECTOR_INDEX_DIR, embed_backend: str = None) -> dict:
+    """Snapshots a Chroma collection into the NumPy index and returns the snapshot."""
+    res = col.get(include=["embeddings", "documents", "metadatas"])
+    embeddings = res.get("embeddings")
+    write_vector_index(
+        res["ids"],
+        embeddings if embeddings is not None else [],
+        res.get("documents") or [],
+        res.get("metadatas") or [],
+        embed_model,
+        root,
+        embed_backend,
+    )
+    return res
+
+
+def get_vector_index(root: Path = VECTOR_INDEX_DIR) -> VectorIndex:
+    """
+    Shared index, loaded on first use and reloaded when a newer one has been
+    written (for example by an ingestion run in another process). While a
+    rewrite is half done the new files do not match, and the loaded index
+    keeps serving until they do.
+    """
+    global _index
+    meta_path = Path(root) / "meta.json"
+    mtime = meta_path.stat().st_mtime_ns
+    if _index is None or _index[0] != mtime:
+        with _index_lock:
+            if _index is None or _index[0] != mtime:
+                try:
+                    _index = (mtime, VectorIndex(root))
+                except ValueError as e:
+                    if _index is None:
+                        raise
+                    print(f"[vector_index] Keeping the loaded index: {e}")
+    return _index[1]
+
+
+if __name__ == "__main__":
+    from src.utils import get_chroma_client, EMBED_MODEL_NAME, EMBED_BACKEND
+    from src.retriever import COLLECTION_NAME
+
+    export_collection(get_chroma_client().get_collection(COLLECTION_NAME), EMBED_MODEL_NAME, embed_backend=EMBED_BACKEND)